@@ -1,89 +1,295 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
 import numpy as np
-from scipy.interpolate import UnivariateSpline
+from scipy.interpolate import UnivariateSpline, PPoly, splrep
 from scipy.integrate import quad
+from scipy.special import comb
 
-#only sample that is based on the original derrivation of the BL formula. 
+#only sample that is based on the original derrivation of the BL formula.
 
-def compute_risk_neutral_pdfs(option_prices_t, strikes_t, option_prices_t_minus_1, strikes_t_minus_1,
-                              time_to_maturity_t, time_to_maturity_t_minus_1, risk_free_rate=0.01,
-                              smoothing_factor=0, spline_degree=3):
+# np.trapz was renamed to np.trapezoid in NumPy 2.0
+_trapezoid = getattr(np, 'trapezoid', None) or np.trapz
+
+# Highest raw moment needed for mean / std_dev / skewness / kurtosis
+MAX_MOMENT_ORDER = 4
+
+# 'spline' fits every slice separately; 'grid' processes all slices of a chain at once
+BL_ENGINES = ('spline', 'grid')
+
+
+def spline_raw_moments(tck, a, b, center=0.0, max_order=MAX_MOMENT_ORDER):
     """
-    Computes the risk-neutral PDFs at two time points using the Breeden-Litzenberger model,
-    calculates statistical moments using SciPy, and plots the PDFs.
+    Integrates (x - center)^p * s(x) over [a, b] exactly for p = 0..max_order,
+    where s is the piecewise polynomial described by the B-spline `tck`.
+
+    Each spline piece is a polynomial q_i(u) in the local coordinate u = x - x_i,
+    so (x - center)^p * q_i(u) is again a polynomial and its integral over the
+    piece follows directly from the coefficients. All pieces and all orders are
+    handled in one vectorized pass.
 
     Parameters:
-    - option_prices_t: array-like, option prices at time t.
-    - strikes_t: array-like, strike prices at time t.
-    - option_prices_t_minus_1: array-like, option prices at time t-1.
-    - strikes_t_minus_1: array-like, strike prices at time t-1.
-    - time_to_maturity_t: float, time to maturity at time t (in years).
-    - time_to_maturity_t_minus_1: float, time to maturity at time t-1 (in years).
+    - tck: tuple (t, c, k) as returned by scipy.interpolate.splrep.
+    - a, b: float, limits of integration.
+    - center: float, point the moments are taken about (keeps powers small).
+    - max_order: int, highest moment order to return.
+
+    Returns:
+    - moments: np.ndarray of length max_order + 1 with the moments about `center`.
+    """
+    pp = PPoly.from_spline(tck)
+    # pp.c[m, i] is the coefficient of u^(k - m) on the piece [x_i, x_{i+1}]
+    k = pp.c.shape[0] - 1
+    left = pp.x[:-1]
+    right = pp.x[1:]
+
+    # Keep only the pieces inside [a, b], clipping the partial ones
+    lo = np.clip(left, a, b)
+    hi = np.clip(right, a, b)
+    keep = hi > lo
+    coeffs = pp.c[::-1, keep]  # coeffs[j, i] multiplies u^j
+    left, lo, hi = left[keep], lo[keep], hi[keep]
+
+    # U[n, i] = integral of u^n * q_i(u) du over the clipped piece
+    n = np.arange(max_order + 1)[:, None, None]
+    j = np.arange(k + 1)[None, :, None]
+    powers = n + j + 1
+    u_lo = (lo - left)[None, None, :]
+    u_hi = (hi - left)[None, None, :]
+    U = np.sum(coeffs[None, :, :] * (u_hi ** powers - u_lo ** powers) / powers, axis=1)
+
+    # Expand (x - center)^p = (s_i + u)^p with s_i = x_i - center
+    shift = left - center
+    moments = np.empty(max_order + 1)
+    for p in range(max_order + 1):
+        l = np.arange(p + 1)
+        weights = comb(p, l)[:, None] * shift[None, :] ** (p - l)[:, None]
+        moments[p] = np.sum(weights * U[:p + 1])
+    return moments
+
+
+def moments_from_raw(raw, center):
+    """
+    Converts moments about `center` (orders 0..4) into the mean / std_dev /
+    skewness / kurtosis dict used throughout the pipeline.
+
+    The density is not renormalized by raw[0], so the values are the same
+    integrals the quad-based computation produces.
+    """
+    mean = center * raw[0] + raw[1]
+    d = mean - center
+    central = [
+        sum(comb(p, l) * (-d) ** (p - l) * raw[l] for l in range(p + 1))
+        for p in range(MAX_MOMENT_ORDER + 1)
+    ]
+    variance = central[2]
+    std_dev = np.sqrt(variance)
+    return {
+        'mean': mean,
+        'std_dev': std_dev,
+        'skewness': central[3] / std_dev ** 3,
+        'kurtosis': central[4] / std_dev ** 4
+    }
+
+
+def compute_pdf_and_moments(option_prices, strikes, time_to_maturity, risk_free_rate=0.01,
+                            smoothing_factor=0, spline_degree=3, moment_method='exact'):
+    """
+    Computes the risk-neutral PDF for a single option slice and its statistical moments.
+
+    Parameters:
+    - option_prices: array-like, option prices.
+    - strikes: array-like, strike prices.
+    - time_to_maturity: float, time to maturity (in years).
     - risk_free_rate: float, annualized risk-free interest rate.
     - smoothing_factor: float, smoothing factor for spline interpolation.
     - spline_degree: int, degree of the spline (1 <= k <= 5).
+    - moment_method: 'exact' integrates the PDF spline in closed form from its
+      coefficients, 'quad' uses scipy.integrate.quad once per moment.
 
     Returns:
-    - results_t: dict, statistical moments and PDF at time t.
-    - results_t_minus_1: dict, statistical moments and PDF at time t-1.
+    - results: dict with 'mean', 'std_dev', 'skewness' and 'kurtosis'.
+    """
+    # Convert inputs to numpy arrays
+    strikes = np.array(strikes)
+    option_prices = np.array(option_prices)
+
+    # Sort the strike prices and corresponding option prices
+    sorted_indices = np.argsort(strikes)
+    strikes = strikes[sorted_indices]
+    option_prices = option_prices[sorted_indices]
+
+    return _moments_from_sorted(option_prices, strikes, np.exp(risk_free_rate * time_to_maturity),
+                                smoothing_factor, spline_degree, moment_method)
+
+
+def _moments_from_sorted(option_prices, strikes, growth, smoothing_factor, spline_degree, moment_method):
+    """
+    Fits the price spline and integrates the moments of one slice whose strikes
+    are already sorted. `growth` is the factor exp(r * T) applied to the second derivative.
+    """
+    # Create spline interpolation of option prices with respect to strike prices
+    spline = UnivariateSpline(strikes, option_prices, s=smoothing_factor, k=spline_degree)
+
+    # Compute the second derivative across all strike prices
+    second_derivs = spline.derivative(n=2)(strikes)
+
+    # Compute the risk-neutral PDF using the Breeden-Litzenberger formula
+    f_rn = growth * second_derivs
+
+    # Ensure the PDF is non-negative
+    f_rn = np.maximum(f_rn, 0)
+
+    # Normalize the PDF so that the area under the curve equals 1
+    area = _trapezoid(f_rn, strikes)
+    f_rn_normalized = f_rn / area
+
+    # Define the limits of integration
+    a = strikes[0]
+    b = strikes[-1]
+
+    if moment_method == 'exact':
+        # Same interpolating cubic as UnivariateSpline(s=0, k=3), integrated from its coefficients
+        tck = splrep(strikes, f_rn_normalized, s=0, k=3)
+        center = 0.5 * (a + b)
+        return moments_from_raw(spline_raw_moments(tck, a, b, center), center)
+
+    if moment_method != 'quad':
+        raise ValueError(f"Unknown moment_method: {moment_method!r}")
+
+    # Create a spline of the normalized PDF for integration
+    pdf_spline = UnivariateSpline(strikes, f_rn_normalized, s=0, k=3, ext=1)
+
+    # Compute statistical moments using scipy.integrate.quad
+    mean, _ = quad(lambda x: x * pdf_spline(x), a, b, limit=2000)
+    variance, _ = quad(lambda x: (x - mean) ** 2 * pdf_spline(x), a, b, limit=2000)
+    std_dev = np.sqrt(variance)
+    skewness_numerator, _ = quad(lambda x: (x - mean) ** 3 * pdf_spline(x), a, b, limit=2000)
+    skewness = skewness_numerator / std_dev ** 3
+    kurtosis_numerator, _ = quad(lambda x: (x - mean) ** 4 * pdf_spline(x), a, b, limit=2000)
+    kurtosis = kurtosis_numerator / std_dev ** 4
+
+    results = {
+        'mean': mean,
+        'std_dev': std_dev,
+        'skewness': skewness,
+        'kurtosis': kurtosis
+    }
+    return results
+
+
+def grid_moments(slices, growth, grid_step=None):
     """
+    Grid engine: moments of many option slices in a handful of array operations.
 
-    # Function to compute risk-neutral PDF and statistical moments using SciPy
-    def compute_pdf_and_moments(option_prices, strikes, time_to_maturity):
-        # Convert inputs to numpy arrays
-        strikes = np.array(strikes)
-        option_prices = np.array(option_prices)
+    Every slice is resampled with np.interp onto its own uniform strike grid,
+    the Breeden-Litzenberger second derivative is taken for all of them at once
+    by central finite differences, and the moments of all slices follow from
+    one vectorized sum of (K - center)^p weights. A slice's grid (spacing and
+    origin) depends on that slice only, so its moments are the same whichever
+    other slices share the batch.
 
-        # Sort the strike prices and corresponding option prices
-        sorted_indices = np.argsort(strikes)
-        strikes = strikes[sorted_indices]
-        option_prices = option_prices[sorted_indices]
+    Parameters:
+    - slices: list of (strikes, prices) array pairs, strikes sorted ascending.
+    - growth: array-like, exp(r * T) of each slice.
+    - grid_step: float, spacing of the strike grids (default: each slice's median strike spacing).
 
-        # Create spline interpolation of option prices with respect to strike prices
-        spline = UnivariateSpline(strikes, option_prices, s=smoothing_factor, k=spline_degree)
+    Returns:
+    - moments: dict of np.ndarray ('mean', 'std_dev', 'skewness', 'kurtosis'), one value per slice.
+    """
+    lows = np.array([strikes[0] for strikes, _ in slices], dtype=float)
+    highs = np.array([strikes[-1] for strikes, _ in slices], dtype=float)
+    if grid_step is None:
+        steps = []
+        for strikes, _ in slices:
+            spacings = np.diff(strikes)
+            spacings = spacings[spacings > 0]
+            steps.append(float(np.median(spacings)) if len(spacings) else 1.0)
+        steps = np.array(steps)
+    else:
+        steps = np.full(len(slices), float(grid_step))
 
-        # Compute the second derivative across all strike prices
-        second_derivs = spline.derivative(n=2)(strikes)
+    # Each grid starts on a multiple of its step at or below the first strike;
+    # shorter grids are padded past their last strike (masked out below)
+    origins = np.floor(lows / steps) * steps
+    sizes = np.floor((highs - origins) / steps + 0.5).astype(int) + 1
+    grids = origins[:, None] + steps[:, None] * np.arange(max(sizes.max(), 3))
+    prices = np.vstack([np.interp(grid, strikes, values) for grid, (strikes, values) in zip(grids, slices)])
 
-        # Compute the risk-neutral PDF using the Breeden-Litzenberger formula
-        f_rn = np.exp(risk_free_rate * time_to_maturity) * second_derivs
+    # Butterfly second differences at the interior grid points
+    second_derivs = (prices[:, 2:] - 2 * prices[:, 1:-1] + prices[:, :-2]) / steps[:, None] ** 2
+    x = grids[:, 1:-1]
 
-        # Ensure the PDF is non-negative
-        f_rn = np.maximum(f_rn, 0)
+    # np.interp is flat beyond a slice's quoted strikes, so only points whose
+    # whole stencil lies inside them carry density
+    tol = 1e-9 * steps[:, None]
+    inside = (grids[:, :-2] >= lows[:, None] - tol) & (grids[:, 2:] <= highs[:, None] + tol)
+    f_rn = np.where(inside, np.maximum(np.asarray(growth, dtype=float)[:, None] * second_derivs, 0), 0.0)
 
-        # Normalize the PDF so that the area under the curve equals 1
-        area = np.trapz(f_rn, strikes)
-        f_rn_normalized = f_rn / area
+    # Normalize each PDF so that the area under the curve equals 1
+    with np.errstate(invalid='ignore', divide='ignore'):
+        f_rn = f_rn / (f_rn.sum(axis=1, keepdims=True) * steps[:, None])
 
-        # Create a spline of the normalized PDF for integration
-        pdf_spline = UnivariateSpline(strikes, f_rn_normalized, s=0, k=3, ext=1)
+    center = 0.5 * (lows + highs)
+    powers = (x - center[:, None])[None] ** np.arange(MAX_MOMENT_ORDER + 1)[:, None, None]
+    return moments_from_raw(np.sum(powers * f_rn[None], axis=2) * steps, center)
 
-        # Define the limits of integration
-        a = strikes[0]
-        b = strikes[-1]
 
-        # Compute statistical moments using scipy.integrate.quad
-        mean, _ = quad(lambda x: x * pdf_spline(x), a, b, limit=2000)
-        variance, _ = quad(lambda x: (x - mean) ** 2 * pdf_spline(x), a, b, limit=2000)
-        std_dev = np.sqrt(variance)
-        skewness_numerator, _ = quad(lambda x: (x - mean) ** 3 * pdf_spline(x), a, b, limit=2000)
-        skewness = skewness_numerator / std_dev ** 3
-        kurtosis_numerator, _ = quad(lambda x: (x - mean) ** 4 * pdf_spline(x), a, b, limit=2000)
-        kurtosis = kurtosis_numerator / std_dev ** 4
+def check_moment_methods(option_prices, strikes, time_to_maturity, rtol=1e-6, atol=1e-6, **kwargs):
+    """
+    Compares the closed-form moments against the quad reference for one option slice.
+
+    A moment passes if |exact - quad| <= atol + rtol * |quad|, so near-zero
+    values such as the skewness of a symmetric density are judged by `atol`.
 
-        results = {
-            'mean': mean,
-            'std_dev': std_dev,
-            'skewness': skewness,
-            'kurtosis': kurtosis
-        }
-        return results
+    Returns:
+    - ok: bool, True if every moment is within tolerance.
+    - abs_errors: dict, absolute difference per moment.
+    """
+    exact = compute_pdf_and_moments(option_prices, strikes, time_to_maturity,
+                                    moment_method='exact', **kwargs)
+    reference = compute_pdf_and_moments(option_prices, strikes, time_to_maturity,
+                                        moment_method='quad', **kwargs)
+    abs_errors = {key: abs(exact[key] - reference[key]) for key in reference}
+    ok = all(abs_errors[key] <= atol + rtol * abs(reference[key]) for key in reference)
+    return ok, abs_errors
+
+
+def compute_risk_neutral_pdfs(option_prices_t, strikes_t, option_prices_t_minus_1, strikes_t_minus_1,
+                              time_to_maturity_t, time_to_maturity_t_minus_1, risk_free_rate=0.01,
+                              smoothing_factor=0, spline_degree=3, moment_method='exact'):
+    """
+    Computes the risk-neutral PDFs at two time points using the Breeden-Litzenberger model
+    and their statistical moments with compute_pdf_and_moments: integrated in closed form
+    over the spline's piecewise polynomial by default, or with SciPy quad for
+    moment_method='quad'. The comparison plot of the PDFs is disabled.
+
+    Parameters:
+    - option_prices_t: array-like, option prices at time t.
+    - strikes_t: array-like, strike prices at time t.
+    - option_prices_t_minus_1: array-like, option prices at time t-1.
+    - strikes_t_minus_1: array-like, strike prices at time t-1.
+    - time_to_maturity_t: float, time to maturity at time t (in years).
+    - time_to_maturity_t_minus_1: float, time to maturity at time t-1 (in years).
+    - risk_free_rate: float, annualized risk-free interest rate.
+    - smoothing_factor: float, smoothing factor for spline interpolation.
+    - spline_degree: int, degree of the spline (1 <= k <= 5).
+    - moment_method: str, 'exact' (closed-form spline integration) or 'quad'.
+
+    Returns:
+    - results_t: dict, statistical moments and PDF at time t.
+    - results_t_minus_1: dict, statistical moments and PDF at time t-1.
+    """
+    params = dict(risk_free_rate=risk_free_rate, smoothing_factor=smoothing_factor,
+                  spline_degree=spline_degree, moment_method=moment_method)
 
     # Compute for time t
-    results_t = compute_pdf_and_moments(option_prices_t, strikes_t, time_to_maturity_t)
+    results_t = compute_pdf_and_moments(option_prices_t, strikes_t, time_to_maturity_t, **params)
 
     # Compute for time t-1
     results_t_minus_1 = compute_pdf_and_moments(option_prices_t_minus_1, strikes_t_minus_1,
-                                                time_to_maturity_t_minus_1)  # dfgdfgfdgdgdfgfdg
+                                                time_to_maturity_t_minus_1, **params)
 
     # Plot PDFs from both time points for comparison
     '''
@@ -97,4 +303,194 @@ def compute_risk_neutral_pdfs(option_prices_t, strikes_t, option_prices_t_minus_
     plt.grid(True)
     plt.show()'''
 
-    return results_t, results_t_minus_1
\ No newline at end of file
+    return results_t, results_t_minus_1
+
+
+class MomentCache:
+    """
+    Thread-safe LRU cache of BL moments keyed on (quote_date, expire_date, side, digest).
+
+    The digest hashes the strikes, prices, growth factor and model parameters of
+    the slice, so a cached entry is only reused for identical inputs. A single
+    module-level instance (`moment_cache`) is shared by every pipeline run in the
+    process, which lets day t of one iteration serve as day t-1 of the next.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(quote_date, expire_date, side, strikes, prices, growth, *params):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.ascontiguousarray(strikes, dtype=float).tobytes())
+        digest.update(np.ascontiguousarray(prices, dtype=float).tobytes())
+        digest.update(repr((float(growth),) + params).encode())
+        return (str(quote_date), str(expire_date), side, digest.hexdigest())
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(value)
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = dict(value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Process-wide cache shared across pipeline iterations and API requests
+moment_cache = MomentCache()
+
+
+def group_bounds(sorted_keys):
+    """
+    Returns the (starts, ends) row bounds of the runs of equal values in an
+    already sorted key array. Linear time, no copies of the data.
+    """
+    sorted_keys = np.asarray(sorted_keys)
+    if len(sorted_keys) == 0:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty
+    breaks = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(sorted_keys)]))
+    return starts, ends
+
+
+def chain_groups(expire_date, strike):
+    """
+    Sorts one quote date's chain by (expire_date, strike) and finds the expiry groups.
+
+    Returns:
+    - order: np.ndarray, permutation that sorts the chain.
+    - starts, ends: np.ndarray, row bounds of each expiry group in sorted order.
+    """
+    expire_date = np.asarray(expire_date)
+    order = np.lexsort((np.asarray(strike), expire_date))
+    starts, ends = group_bounds(expire_date[order])
+    return order, starts, ends
+
+
+def compute_chain_moments(strike, c_last, p_last, dte, expire_date, expire_dates=None,
+                          risk_free_rate=0.01, smoothing_factor=0, spline_degree=3,
+                          moment_method='exact', days_per_year=252, quote_date=None, cache=None,
+                          presorted=False, engine='spline', grid_step=None, metrics=None):
+    """
+    Computes the risk-neutral moments for every expiry and both option sides
+    of one quote date's option chain in a single call.
+
+    Parameters:
+    - strike, c_last, p_last, dte, expire_date: array-like, one row per quoted strike.
+    - expire_dates: iterable, optional subset of expiries to compute.
+    - risk_free_rate: float, annualized risk-free interest rate.
+    - smoothing_factor: float, smoothing factor for spline interpolation.
+    - spline_degree: int, degree of the spline (1 <= k <= 5).
+    - moment_method: str, 'exact' (closed-form spline integration) or 'quad'.
+    - days_per_year: int, divisor turning DTE into years.
+    - quote_date: str, quote date of the chain, required for caching.
+    - cache: MomentCache, optional cache consulted before fitting each slice.
+    - presorted: bool, rows are already sorted by (expire_date, strike); the
+      expiry groups are then found without sorting and every slice is a view.
+    - engine: str, 'spline' fits each slice (smoothing_factor, spline_degree and
+      moment_method apply), 'grid' computes all slices together with grid_moments.
+    - grid_step: float, strike grid spacing of the 'grid' engine.
+    - metrics: PipelineMetrics, optional; the cache hits and misses of this call
+      are counted there as 'bl_moments' (the cache itself is shared process-wide).
+
+    Returns:
+    - results: dict {expire_date: {'call': moments, 'put': moments}}, ordered by expiry.
+    """
+    if engine not in BL_ENGINES:
+        raise ValueError(f"Unknown engine: {engine!r}")
+
+    strike = np.asarray(strike, dtype=float)
+    prices = {
+        'call': np.asarray(c_last, dtype=float),
+        'put': np.asarray(p_last, dtype=float),
+    }
+    dte = np.asarray(dte, dtype=float)
+    expire_date = np.asarray(expire_date)
+
+    if presorted:
+        starts, ends = group_bounds(expire_date)
+    else:
+        order, starts, ends = chain_groups(expire_date, strike)
+        strike, dte, expire_date = strike[order], dte[order], expire_date[order]
+        prices = {side: values[order] for side, values in prices.items()}
+    group_expiries = expire_date[starts]
+
+    if expire_dates is not None:
+        wanted = set(expire_dates)
+        keep = np.array([expiry in wanted for expiry in group_expiries], dtype=bool)
+        starts, ends, group_expiries = starts[keep], ends[keep], group_expiries[keep]
+
+    # Time to maturity of each group is taken from its last (highest-strike) row
+    growth = np.exp(risk_free_rate * dte[ends - 1] / days_per_year)
+
+    use_cache = cache is not None and quote_date is not None
+    if engine == 'spline':
+        params = (smoothing_factor, spline_degree, moment_method)
+    else:
+        params = (engine, grid_step)
+
+    results = {}
+    cache_hits = cache_misses = 0
+    # Slices left for the grid engine: (expiry, side, strikes, prices, growth, cache key)
+    pending = []
+    for expiry, start, end, g in zip(group_expiries, starts, ends, growth):
+        results[expiry] = {}
+        for side, values in prices.items():
+            slice_strikes, slice_prices = strike[start:end], values[start:end]
+            key = None
+            if use_cache:
+                key = cache.make_key(quote_date, expiry, side, slice_strikes, slice_prices, g, *params)
+                moments = cache.get(key)
+                if moments is not None:
+                    cache_hits += 1
+                    results[expiry][side] = moments
+                    continue
+                cache_misses += 1
+            if engine == 'grid':
+                results[expiry][side] = None
+                pending.append((expiry, side, slice_strikes, slice_prices, g, key))
+                continue
+            moments = {
+                name: float(value)
+                for name, value in _moments_from_sorted(slice_prices, slice_strikes, g, *params).items()
+            }
+            if use_cache:
+                cache.put(key, moments)
+            results[expiry][side] = moments
+
+    if pending:
+        computed = grid_moments([(k, p) for _, _, k, p, _, _ in pending],
+                                [g for *_, g, _ in pending], grid_step)
+        for i, (expiry, side, _, _, _, key) in enumerate(pending):
+            moments = {name: float(values[i]) for name, values in computed.items()}
+            if use_cache:
+                cache.put(key, moments)
+            results[expiry][side] = moments
+
+    if use_cache and metrics is not None:
+        metrics.cache('bl_moments', cache_hits, cache_misses)
+    return results
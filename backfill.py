@@ -0,0 +1,134 @@
+import argparse
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from BL_dynamics import BL_ENGINES, compute_chain_moments
+from bl_config import BL_PARAMS, MAX_DTE, PREV_DAY_DTE_MARGIN
+from columnar_store import DEFAULT_COLUMNAR_DIR, open_if_fresh
+from data_loader import DEFAULT_DB_PATH, DEFAULT_TABLE, OPTION_COLUMNS, ensure_indexes, iter_option_days
+from moment_store import DEFAULT_MOMENT_DB, MomentStore, params_version, source_scope
+
+# Per-process data source, opened once by _init_worker
+_source = None
+
+
+def _init_worker(columnar_dir, db_path, table):
+    """
+    Opens the data source in each worker. With a columnar cache the workers map
+    the same .npy files, so a day's chain reaches them without any pickling;
+    otherwise each worker reads its days from SQLite through the quote_date index.
+    """
+    global _source
+    columns = open_if_fresh(columnar_dir, db_path, table)
+    if columns is not None:
+        _source = ('columnar', columns)
+    else:
+        _source = ('sqlite', (sqlite3.connect(db_path), table))
+
+
+def _day_chain(quote_date, max_dte):
+    kind, source = _source
+    if kind == 'columnar':
+        return source.day(quote_date)
+    conn, table = source
+    return next(iter_option_days(conn, [quote_date], max_dte=max_dte, table=table))[1]
+
+
+def _compute_day(quote_date, max_dte, bl_params):
+    """
+    Worker task: BL moments of every expiry with DTE <= max_dte on one quote date.
+    """
+    chain = _day_chain(quote_date, max_dte)
+    expire_dates = np.asarray(chain['expire_date'])
+    if max_dte is not None:
+        expire_dates = expire_dates[np.asarray(chain['dte']) <= max_dte]
+    try:
+        moments = compute_chain_moments(
+            chain['strike'], chain['c_last'], chain['p_last'], chain['dte'], chain['expire_date'],
+            expire_dates=np.unique(expire_dates), presorted=True, **bl_params
+        )
+    except Exception as e:
+        print(f"Error {e} on {quote_date}")
+        moments = {}
+    return quote_date, moments
+
+
+def _all_quote_dates(conn, table):
+    rows = conn.execute(f'SELECT DISTINCT {OPTION_COLUMNS["quote_date"]} FROM {table} ORDER BY 1').fetchall()
+    return [row[0] for row in rows]
+
+
+def backfill_moments(quote_dates=None, start=None, end=None, workers=None, db_path=DEFAULT_DB_PATH,
+                     table=DEFAULT_TABLE, columnar_dir=DEFAULT_COLUMNAR_DIR,
+                     moment_db_path=DEFAULT_MOMENT_DB, max_dte=MAX_DTE, bl_params=BL_PARAMS,
+                     recompute=False):
+    """
+    Computes BL moments for a range of quote dates on a process pool and writes
+    them to the moment store in date order.
+
+    Each date covers expiries up to max_dte + PREV_DAY_DTE_MARGIN, so the stored
+    dates serve both as day t and as day t-1 of the pipeline. Dates that already
+    have moments for the current parameter version are skipped unless `recompute`.
+    Rows of a non-default db_path or table are stored under their own version
+    (see moment_store.source_scope).
+
+    Returns:
+    - computed: list of quote dates that were computed.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        ensure_indexes(conn, table)
+        if quote_dates is None:
+            quote_dates = _all_quote_dates(conn, table)
+    finally:
+        conn.close()
+
+    # Stored dates may carry the OptionsDX padding (' 2023-01-04'); the bounds are plain ISO dates
+    quote_dates = [d for d in quote_dates
+                   if (start is None or str(d).strip() >= start.strip())
+                   and (end is None or str(d).strip() <= end.strip())]
+
+    store = MomentStore(moment_db_path)
+    version = params_version(**bl_params, source=source_scope(db_path, table))
+    if not recompute:
+        done = store.stored_dates(version)
+        quote_dates = [d for d in quote_dates if d not in done]
+    if not quote_dates:
+        return []
+
+    day_max_dte = None if max_dte is None else max_dte + PREV_DAY_DTE_MARGIN
+    workers = workers or os.cpu_count()
+    chunksize = max(1, len(quote_dates) // (workers * 4))
+
+    computed = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(columnar_dir, db_path, table)) as executor:
+        results = executor.map(_compute_day, quote_dates, [day_max_dte] * len(quote_dates),
+                               [bl_params] * len(quote_dates), chunksize=chunksize)
+        # map() yields in submission order, so the store is filled date by date
+        for quote_date, moments in results:
+            store.save(version, quote_date, moments)
+            computed.append(quote_date)
+    return computed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill BL moments across quote dates on a process pool.")
+    parser.add_argument('--start', help="First quote date (YYYY-MM-DD), inclusive")
+    parser.add_argument('--end', help="Last quote date (YYYY-MM-DD), inclusive")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="SQLite database with the options table")
+    parser.add_argument('--table', default=DEFAULT_TABLE, help="Options table name")
+    parser.add_argument('--columnar-dir', default=DEFAULT_COLUMNAR_DIR, help="Columnar cache directory")
+    parser.add_argument('--moment-db', default=DEFAULT_MOMENT_DB, help="Moment store database")
+    parser.add_argument('--recompute', action='store_true', help="Recompute dates already in the store")
+    parser.add_argument('--engine', choices=BL_ENGINES, default='spline', help="BL engine")
+    args = parser.parse_args()
+
+    computed = backfill_moments(start=args.start, end=args.end, workers=args.workers, db_path=args.db,
+                                table=args.table, columnar_dir=args.columnar_dir, moment_db_path=args.moment_db,
+                                bl_params=dict(BL_PARAMS, engine=args.engine), recompute=args.recompute)
+    print(f"Computed BL moments for {len(computed)} quote dates")
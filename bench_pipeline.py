@@ -0,0 +1,389 @@
+import argparse
+import asyncio
+import datetime as dt
+import hashlib
+import json
+import os
+import platform
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+import types
+import warnings
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import scipy
+from scipy.stats import norm
+
+import main
+import news_analysis
+from BL_dynamics import BL_ENGINES, compute_chain_moments, compute_pdf_and_moments, moment_cache
+from bl_payload import estimate_tokens
+from data_loader import DEFAULT_TABLE, OPTION_COLUMNS, ensure_indexes
+from llm_cache import ResponseCache
+
+DEFAULT_BENCH_OUT = 'bench_results.json'
+
+# Raw columns of the synthetic table, in insert order
+SYNTHETIC_COLUMNS = ('quote_date', 'expire_date', 'strike', 'c_last', 'p_last', 'dte',
+                     'underlying_last', 'c_volume', 'p_volume')
+
+
+def black_scholes_call(spot, strikes, years, rate, vol):
+    d1 = (np.log(spot / strikes) + (rate + 0.5 * vol ** 2) * years) / (vol * np.sqrt(years))
+    d2 = d1 - vol * np.sqrt(years)
+    return spot * norm.cdf(d1) - strikes * np.exp(-rate * years) * norm.cdf(d2)
+
+
+def make_synthetic_db(path, n_days=30, n_expiries=8, n_strikes=120, strike_step=5.0, spot=4000.0,
+                      seed=0, table=DEFAULT_TABLE):
+    """
+    Writes SPX-like option chains into a SQLite table with the spx_data schema.
+
+    Parameters:
+    - path: str, SQLite file to (re)create.
+    - n_days: int, number of business-day quote dates.
+    - n_expiries: int, expiries quoted each day (Mon / Wed / Fri cycle, nearest first).
+    - n_strikes: int, strikes per expiry, centred on the spot.
+    - strike_step: float, strike spacing.
+    - spot: float, initial underlying price; it follows a seeded random walk.
+    - seed: int, random seed.
+    - table: str, table name.
+
+    Returns:
+    - n_rows: int, rows written.
+    """
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    try:
+        columns = ', '.join(f'{OPTION_COLUMNS[c]} {"TEXT" if c.endswith("date") else "REAL"}'
+                            for c in SYNTHETIC_COLUMNS)
+        conn.execute(f'DROP TABLE IF EXISTS {table}')
+        conn.execute(f'CREATE TABLE {table} ({columns})')
+
+        day = dt.date(2023, 1, 2)
+        n_rows = 0
+        for _ in range(n_days):
+            while day.weekday() >= 5:
+                day += dt.timedelta(days=1)
+            spot *= np.exp(0.01 * rng.standard_normal())
+
+            expiries = []
+            expiry = day
+            while len(expiries) < n_expiries:
+                if expiry.weekday() in (0, 2, 4):
+                    expiries.append(expiry)
+                expiry += dt.timedelta(days=1)
+
+            centre = round(spot / strike_step) * strike_step
+            strikes = centre + strike_step * (np.arange(n_strikes) - n_strikes // 2)
+            rows = []
+            for expiry in expiries:
+                dte = (expiry - day).days
+                years = max(dte, 0.5) / 252
+                # Smile: volatility rises away from the money
+                vol = 0.18 + 5 * ((strikes - spot) / spot) ** 2
+                calls = black_scholes_call(spot, strikes, years, 0.01, vol)
+                puts = calls - spot + strikes * np.exp(-0.01 * years)
+                c_volume = rng.integers(0, 500, n_strikes)
+                p_volume = rng.integers(0, 500, n_strikes)
+                rows += [(day.isoformat(), expiry.isoformat(), float(k), round(float(c), 2),
+                          round(float(p), 2), float(dte), float(spot), float(cv), float(pv))
+                         for k, c, p, cv, pv in zip(strikes, calls, puts, c_volume, p_volume)]
+            conn.executemany(f'INSERT INTO {table} VALUES ({",".join("?" * len(SYNTHETIC_COLUMNS))})', rows)
+            n_rows += len(rows)
+            day += dt.timedelta(days=1)
+
+        conn.commit()
+        ensure_indexes(conn, table)
+    finally:
+        conn.close()
+    return n_rows
+
+
+def _score_for(text):
+    # Deterministic pseudo-score in {-1, -0.5, 0, 0.5, 1} derived from the prompt
+    return (int(hashlib.sha256(text.encode('utf-8')).hexdigest()[:8], 16) % 5 - 2) / 2
+
+
+class FakeOpenAI:
+    """
+    Offline stand-in for the OpenAI client's beta.chat.completions.parse.
+
+    Every request sleeps `latency` seconds and returns deterministic scores
+    derived from the prompt, parsed into whichever response format was asked
+    for, with a `usage` field estimated from the prompt size.
+    """
+
+    def __init__(self, latency=0.0, asynchronous=False):
+        self.latency = latency
+        self.requests = 0
+        parse = self._parse_async if asynchronous else self._parse
+        self.beta = types.SimpleNamespace(chat=types.SimpleNamespace(
+            completions=types.SimpleNamespace(parse=parse)))
+
+    def _completion(self, messages, response_format):
+        self.requests += 1
+        prompt = ''.join(message['content'] for message in messages)
+        user = messages[-1]['content']
+
+        if response_format is None:
+            content, parsed = f'(1, «Financial News», {int(_score_for(user) > 0)}, 1)', None
+        else:
+            content = None
+            if response_format is news_analysis.PolarityResponse:
+                parsed = response_format(news_analysis_score=_score_for(user), combined_score=_score_for(prompt))
+            else:
+                # Batched formats: one entry per 'Date <quote_date>:' block of the user message
+                dates = [line[5:-1] for line in user.splitlines() if line.startswith('Date ') and line.endswith(':')]
+                if response_format is news_analysis.BatchNewsResponse:
+                    days = [news_analysis.DayNewsClassification(quote_date=d, classification='(1, «Financial News», 1, 1)')
+                            for d in dates]
+                else:
+                    days = [news_analysis.DayPolarity(quote_date=d, news_analysis_score=_score_for(d),
+                                                      combined_score=_score_for(d + user)) for d in dates]
+                parsed = response_format(days=days)
+
+        prompt_tokens = estimate_tokens(prompt)
+        usage = types.SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=20,
+                                      total_tokens=prompt_tokens + 20)
+        message = types.SimpleNamespace(content=content, parsed=parsed)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=usage)
+
+    def _parse(self, model, messages, response_format=None, temperature=0.0):
+        time.sleep(self.latency)
+        return self._completion(messages, response_format)
+
+    async def _parse_async(self, model, messages, response_format=None, temperature=0.0):
+        await asyncio.sleep(self.latency)
+        return self._completion(messages, response_format)
+
+
+def fake_news(latency=0.0):
+    """
+    Returns (get_news, get_news_async) stand-ins serving a few fixed headlines
+    per date, in the {title: text} shape of news_api_wrapper.get_news.
+    """
+    def news_for(date_str, ticker):
+        return {f'{ticker} headline {i} on {date_str}': f'Synthetic market news item {i} for {date_str}.'
+                for i in range(5)}
+
+    def get_news(date_str, ticker='SPY'):
+        time.sleep(latency)
+        return news_for(date_str, ticker)
+
+    async def get_news_async(date_str, ticker='SPY', client=None):
+        await asyncio.sleep(latency)
+        return news_for(date_str, ticker)
+
+    return get_news, get_news_async
+
+
+def install_fakes(llm_latency=0.0, news_latency=0.0):
+    """
+    Routes the pipeline's news and OpenAI calls to the offline fakes.
+    Returns (sync client, async client).
+    """
+    sync_client = FakeOpenAI(llm_latency)
+    async_client = FakeOpenAI(llm_latency, asynchronous=True)
+    news_analysis.client = sync_client
+    news_analysis.async_client = async_client
+    main.get_news, main.get_news_async = fake_news(news_latency)
+    return sync_client, async_client
+
+
+def use_llm_cache(db_path):
+    news_analysis.response_cache = main.response_cache = ResponseCache(db_path)
+
+
+def latency_summary(samples):
+    samples = np.asarray(samples, dtype=float)
+    return {
+        'n': int(len(samples)),
+        'mean_s': float(samples.mean()),
+        'median_s': float(np.median(samples)),
+        'p95_s': float(np.percentile(samples, 95)),
+        'min_s': float(samples.min()),
+        'throughput_per_s': float(len(samples) / samples.sum()) if samples.sum() > 0 else None,
+    }
+
+
+def bench_engine(db_path, repeats=5, quad_repeats=1, table=DEFAULT_TABLE):
+    """
+    Times the BL engine on the first quote date of the synthetic table: every
+    call and put slice with both moment methods, and the whole day through
+    compute_chain_moments (uncached) with each engine. The 'quad' method is orders of magnitude
+    slower, so it gets its own, smaller repeat count.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        first = conn.execute(f'SELECT MIN({OPTION_COLUMNS["quote_date"]}) FROM {table}').fetchone()[0]
+        rows = conn.execute(
+            f'SELECT {OPTION_COLUMNS["expire_date"]}, {OPTION_COLUMNS["strike"]}, {OPTION_COLUMNS["c_last"]}, '
+            f'{OPTION_COLUMNS["p_last"]}, {OPTION_COLUMNS["dte"]} FROM {table} '
+            f'WHERE {OPTION_COLUMNS["quote_date"]} = ? ORDER BY 1, 2', (first,)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    expire_date = np.array([r[0] for r in rows])
+    strike, c_last, p_last, dte = (np.array([r[i] for r in rows], dtype=float) for i in range(1, 5))
+    results = {}
+
+    for method, n_repeats in (('exact', repeats), ('quad', quad_repeats)):
+        samples = []
+        for _ in range(n_repeats):
+            for expiry in np.unique(expire_date):
+                mask = expire_date == expiry
+                years = dte[mask][-1] / 252
+                for prices in (c_last[mask], p_last[mask]):
+                    with warnings.catch_warnings():
+                        # quad's IntegrationWarnings on the spline kinks
+                        warnings.simplefilter('ignore')
+                        start = time.perf_counter()
+                        compute_pdf_and_moments(prices, strike[mask], years, moment_method=method)
+                        samples.append(time.perf_counter() - start)
+        results[f'slice_{method}'] = latency_summary(samples)
+
+    for engine in BL_ENGINES:
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            compute_chain_moments(strike, c_last, p_last, dte, expire_date, presorted=True, engine=engine)
+            samples.append(time.perf_counter() - start)
+        results[f'chain_day_{engine}'] = latency_summary(samples)
+    results['slices_per_day'] = int(2 * len(np.unique(expire_date)))
+    return results
+
+
+def _run_once(workdir, run_id, db_path, n_days, pipeline_kwargs, cold, trace_memory):
+    # Cold runs start from empty moment stores and caches, warm runs share them
+    suffix = run_id if cold else 'warm'
+    moment_db = os.path.join(workdir, f'bl_moments_{suffix}.db')
+    use_llm_cache(os.path.join(workdir, f'llm_cache_{suffix}.db'))
+    if cold:
+        moment_cache.clear()
+
+    if trace_memory:
+        tracemalloc.start()
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    df_plot, fig = main.run_pipeline(n_days=n_days, db_path=db_path, moment_db_path=moment_db,
+                                     columnar_dir=None, news_db_path=None, **pipeline_kwargs)
+    wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    if fig is not None:
+        plt.close(fig)
+    return df_plot, wall, cpu, peak
+
+
+def bench_pipeline(workdir, db_path, n_days, repeats=3, **pipeline_kwargs):
+    """
+    Times full run_pipeline calls against the synthetic table, cold (empty
+    moment store and LLM cache) and warm (every BL slice and response cached).
+    Each scenario is timed `repeats` times, then run once more under
+    tracemalloc for its peak Python memory.
+    """
+    results = {}
+    for scenario, cold in (('cold', True), ('warm', False)):
+        if not cold:
+            # Fill the warm store once before timing
+            _run_once(workdir, 'prime', db_path, n_days, pipeline_kwargs, False, False)
+
+        walls, cpus, stages = [], [], {}
+        for i in range(repeats):
+            df_plot, wall, cpu, _ = _run_once(workdir, f'{scenario}{i}', db_path, n_days,
+                                              pipeline_kwargs, cold, False)
+            walls.append(wall)
+            cpus.append(cpu)
+            for name, entry in df_plot.attrs['metrics']['stages'].items():
+                stages.setdefault(name, []).append(entry['wall'])
+
+        _, _, _, peak = _run_once(workdir, f'{scenario}_mem', db_path, n_days, pipeline_kwargs, cold, True)
+        metrics = df_plot.attrs['metrics']
+        results[scenario] = {
+            'run': latency_summary(walls),
+            'cpu_s_mean': float(np.mean(cpus)),
+            'days_per_s': float(n_days / np.median(walls)),
+            'stage_wall_s_median': {name: float(np.median(values)) for name, values in stages.items()},
+            'caches': metrics['caches'],
+            'tokens': metrics['tokens'],
+            'peak_traced_memory_mb': peak / 2 ** 20,
+        }
+    return results
+
+
+def run_benchmarks(n_days=30, n_expiries=8, n_strikes=120, repeats=3, llm_latency=0.0, news_latency=0.0,
+                   concurrency=1, llm_batch_size=1, engine='spline', seed=0, workdir=None):
+    """
+    Builds the synthetic database in a temporary directory, installs the offline
+    fakes and runs the engine and pipeline benchmarks. Returns the JSON report.
+    """
+    config = dict(n_days=n_days, n_expiries=n_expiries, n_strikes=n_strikes, repeats=repeats,
+                  llm_latency=llm_latency, news_latency=news_latency, concurrency=concurrency,
+                  llm_batch_size=llm_batch_size, engine=engine, seed=seed)
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        db_path = os.path.join(tmp, 'spx_data.db')
+        start = time.perf_counter()
+        n_rows = make_synthetic_db(db_path, n_days + 1, n_expiries, n_strikes, seed=seed)
+        build_s = time.perf_counter() - start
+
+        sync_client, async_client = install_fakes(llm_latency, news_latency)
+        engine_report = bench_engine(db_path, repeats)
+        pipeline = bench_pipeline(tmp, db_path, n_days, repeats, concurrency=concurrency,
+                                  llm_batch_size=llm_batch_size, engine=engine)
+
+    return {
+        'created_at': dt.datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scipy': scipy.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': config,
+        'data': {'rows': n_rows, 'build_s': build_s},
+        'bl_engine': engine_report,
+        'pipeline': pipeline,
+        'llm_requests': sync_client.requests + async_client.requests,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the BL engine and run_pipeline.")
+    parser.add_argument('--days', type=int, default=30, help="Quote dates scored per pipeline run")
+    parser.add_argument('--expiries', type=int, default=8, help="Expiries quoted per day")
+    parser.add_argument('--strikes', type=int, default=120, help="Strikes per expiry")
+    parser.add_argument('--repeats', type=int, default=3, help="Timed repetitions per benchmark")
+    parser.add_argument('--llm-latency', type=float, default=0.0, help="Seconds per fake OpenAI request")
+    parser.add_argument('--news-latency', type=float, default=0.0, help="Seconds per fake news request")
+    parser.add_argument('--concurrency', type=int, default=1, help="run_pipeline concurrency")
+    parser.add_argument('--batch-size', type=int, default=1, help="run_pipeline llm_batch_size")
+    parser.add_argument('--engine', choices=BL_ENGINES, default='spline', help="run_pipeline BL engine")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed of the synthetic chains")
+    parser.add_argument('--out', default=DEFAULT_BENCH_OUT, help="JSON file the results are written to")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.days, args.expiries, args.strikes, args.repeats, args.llm_latency,
+                            args.news_latency, args.concurrency, args.batch_size, args.engine, args.seed)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    engine_report = report['bl_engine']
+    print(f"BL slice (exact): median {engine_report['slice_exact']['median_s'] * 1e3:.3f} ms, "
+          f"(quad): median {engine_report['slice_quad']['median_s'] * 1e3:.3f} ms")
+    for name in BL_ENGINES:
+        print(f"BL day, {name} engine ({engine_report['slices_per_day']} slices): "
+              f"median {engine_report[f'chain_day_{name}']['median_s'] * 1e3:.2f} ms")
+    for scenario, result in report['pipeline'].items():
+        print(f"Pipeline {scenario}: median {result['run']['median_s']:.3f} s, "
+              f"{result['days_per_s']:.1f} days/s, peak {result['peak_traced_memory_mb']:.1f} MB")
+    print(f"Results written to {args.out}")
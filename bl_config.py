@@ -0,0 +1,16 @@
+# Settings shared by the pipeline (main.py), the backfill workers (backfill.py)
+# and the moment store. This module imports nothing, so the workers do not load
+# the whole pipeline and the API server does not load pandas at startup.
+
+# Default options data source
+DEFAULT_DB_PATH = '/app/spx_data.db'
+DEFAULT_TABLE = 'spx_data'
+
+# Breeden-Litzenberger model parameters; they also version the persisted moments
+BL_PARAMS = dict(risk_free_rate=0.01, smoothing_factor=0, spline_degree=3)
+
+# Near-term expirations analysed each day
+MAX_DTE = 10
+# Extra DTE loaded so that day t-1 still has the expiries selected on day t
+# (covers weekends and market holidays between consecutive quote dates)
+PREV_DAY_DTE_MARGIN = 7
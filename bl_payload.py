@@ -0,0 +1,85 @@
+import math
+
+from moment_store import MOMENT_FIELDS
+
+# Precision of the values sent to the LLM; more digits only cost tokens
+SIGNIFICANT_DIGITS = 4
+# Upper bound on the estimated size of one day's table
+DEFAULT_TOKEN_BUDGET = 1200
+# Rough size of a token for numeric / tabular text (no tokenizer dependency)
+CHARS_PER_TOKEN = 4
+
+ESTIMATOR_SUFFIX = '_bl_estimators'
+SIDES = ('call', 'put')
+
+
+def estimate_tokens(text):
+    """
+    Approximate token count of `text`.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def round_sig(value, digits=SIGNIFICANT_DIGITS):
+    """
+    Formats a number with `digits` significant digits ('nan' for missing values).
+    """
+    if value is None:
+        return 'nan'
+    value = float(value)
+    if not math.isfinite(value):
+        return 'nan'
+    return f'{value:.{digits}g}'
+
+
+def _rows(expiry, estimators, digits):
+    rows = []
+    for side in SIDES:
+        today = estimators[f'{side}_data_t']
+        yesterday = estimators[f'{side}_data_t_minus_1']
+        cells = [expiry, side]
+        for field in MOMENT_FIELDS:
+            value = today.get(field)
+            previous = yesterday.get(field)
+            delta = None if value is None or previous is None else float(value) - float(previous)
+            cells += [round_sig(value, digits), round_sig(delta, digits)]
+        rows.append('\t'.join(cells))
+    return rows
+
+
+def format_bl_table(bl_estimators, digits=SIGNIFICANT_DIGITS, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Serializes one day's BL estimators as a compact TSV table for the LLM prompt.
+
+    Parameters:
+    - bl_estimators: dict {f'{expiry}_bl_estimators': {'call_data_t': moments, 'call_data_t_minus_1': ...,
+                     'put_data_t': ..., 'put_data_t_minus_1': ...}} as built by run_pipeline.
+    - digits: int, significant digits of every value.
+    - token_budget: int or None, cap on the estimated tokens of the table.
+
+    Returns:
+    - table: str with one row per expiry and side, holding each moment on day t
+      and its day-over-day change (d_ columns). Expiries are listed nearest
+      first; those that do not fit into `token_budget` are dropped and counted
+      in a trailing note.
+    """
+    caption = 'Moments on day t per expiry and option side; d_ columns are the change from day t-1 (TSV):'
+    header = '\t'.join(['expiry', 'side'] + [name for field in MOMENT_FIELDS for name in (field, f'd_{field}')])
+    lines = [caption, header]
+    used = estimate_tokens(caption) + estimate_tokens(header)
+
+    expiries = sorted((key[:-len(ESTIMATOR_SUFFIX)] if key.endswith(ESTIMATOR_SUFFIX) else key, estimators)
+                      for key, estimators in bl_estimators.items())
+    omitted = 0
+    for expiry, estimators in expiries:
+        rows = _rows(expiry, estimators, digits)
+        cost = sum(estimate_tokens(row) + 1 for row in rows)
+        if omitted or (token_budget is not None and used + cost > token_budget):
+            omitted += 1
+            continue
+        lines += rows
+        used += cost
+
+    if omitted:
+        lines.append(f'({omitted} further expiries omitted)')
+    return '\n'.join(lines)
@@ -0,0 +1,209 @@
+import argparse
+import json
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from data_loader import (DEFAULT_DB_PATH, DEFAULT_TABLE, OPTION_COLUMNS, ensure_indexes,
+                         iter_option_days, last_quote_date)
+
+DEFAULT_COLUMNAR_DIR = '/app/spx_columns'
+
+# On-disk dtype of every per-row column
+ROW_COLUMNS = {
+    'strike': np.float64,
+    'c_last': np.float64,
+    'p_last': np.float64,
+    'dte': np.float32,
+    'c_volume': np.float32,
+    'p_volume': np.float32,
+}
+
+INGEST_COLUMNS = ('quote_date', 'expire_date', 'strike', 'c_last', 'p_last', 'dte',
+                  'underlying_last', 'c_volume', 'p_volume')
+
+
+def _distinct(conn, column, table):
+    rows = conn.execute(f'SELECT DISTINCT {OPTION_COLUMNS[column]} FROM {table} ORDER BY 1').fetchall()
+    return [row[0] for row in rows]
+
+
+def ingest(db_path=DEFAULT_DB_PATH, out_dir=DEFAULT_COLUMNAR_DIR, table=DEFAULT_TABLE):
+    """
+    Converts the options table once into memory-mappable .npy columns.
+
+    Rows are written partitioned by quote date and sorted by (expire_date, strike)
+    within each day; `day_offsets.npy` holds the row range of every quote date.
+    Expiries are stored as int32 codes into `expire_dates.npy`, and the per-day
+    underlying price and volume totals are precomputed.
+
+    Raises ValueError if the table's row count changes during ingestion; the
+    manifest (meta.json) is only written once every row is in place.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    # The columns are rewritten in place, so an earlier manifest no longer describes them
+    meta_path = os.path.join(out_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        ensure_indexes(conn, table)
+        quote_dates = _distinct(conn, 'quote_date', table)
+        expire_dates = np.array(_distinct(conn, 'expire_date', table), dtype=str)
+        # Rows without a quote date are never read back by iter_option_days
+        n_rows = conn.execute(f'SELECT COUNT({OPTION_COLUMNS["quote_date"]}) FROM {table}').fetchone()[0]
+
+        columns = {
+            name: np.lib.format.open_memmap(os.path.join(out_dir, f'{name}.npy'), mode='w+',
+                                            dtype=dtype, shape=(n_rows,))
+            for name, dtype in ROW_COLUMNS.items()
+        }
+        columns['expire_code'] = np.lib.format.open_memmap(
+            os.path.join(out_dir, 'expire_code.npy'), mode='w+', dtype=np.int32, shape=(n_rows,))
+
+        day_offsets = np.zeros(len(quote_dates) + 1, dtype=np.int64)
+        day_underlying = np.full(len(quote_dates), np.nan)
+        day_c_volume = np.zeros(len(quote_dates))
+        day_p_volume = np.zeros(len(quote_dates))
+
+        # One day at a time keeps ingestion memory at a single day's chain
+        pos = 0
+        days = iter_option_days(conn, quote_dates, table=table, compact=False, columns=INGEST_COLUMNS)
+        for i, (quote_date, df_day) in enumerate(days):
+            n = len(df_day)
+            if pos + n > n_rows:
+                raise ValueError(f"{table} gained rows during ingestion; re-run columnar_store.py")
+            for name, dtype in ROW_COLUMNS.items():
+                columns[name][pos:pos + n] = pd.to_numeric(df_day[name], errors='coerce').to_numpy(dtype)
+            columns['expire_code'][pos:pos + n] = np.searchsorted(
+                expire_dates, df_day['expire_date'].to_numpy(str))
+
+            if n:
+                day_underlying[i] = df_day['underlying_last'].iloc[df_day['strike'].to_numpy().argmin()]
+            day_c_volume[i] = pd.to_numeric(df_day['c_volume'], errors='coerce').sum()
+            day_p_volume[i] = pd.to_numeric(df_day['p_volume'], errors='coerce').sum()
+            pos += n
+            day_offsets[i + 1] = pos
+        if pos != n_rows:
+            raise ValueError(f"Ingested {pos} of the {n_rows} rows counted in {table}; re-run columnar_store.py")
+    finally:
+        conn.close()
+
+    for array in columns.values():
+        array.flush()
+    np.save(os.path.join(out_dir, 'quote_dates.npy'), np.array(quote_dates, dtype=str))
+    np.save(os.path.join(out_dir, 'expire_dates.npy'), expire_dates)
+    np.save(os.path.join(out_dir, 'day_offsets.npy'), day_offsets)
+    np.save(os.path.join(out_dir, 'day_underlying.npy'), day_underlying)
+    np.save(os.path.join(out_dir, 'day_c_volume.npy'), day_c_volume)
+    np.save(os.path.join(out_dir, 'day_p_volume.npy'), day_p_volume)
+
+    meta = {
+        'source_db': os.path.abspath(db_path),
+        'table': table,
+        'n_rows': int(pos),
+        'last_quote_date': quote_dates[-1] if quote_dates else None,
+    }
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class ColumnarStore:
+    """
+    Read side of the columnar cache. Every column is opened with mmap_mode='r',
+    so opening the store is cheap and a day's chain is a zero-copy slice.
+    """
+
+    def __init__(self, path=DEFAULT_COLUMNAR_DIR):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+
+        def load(name, mmap_mode='r'):
+            return np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+
+        self.columns = {name: load(name) for name in list(ROW_COLUMNS) + ['expire_code']}
+        self.quote_dates = load('quote_dates', mmap_mode=None)
+        self.expire_dates = load('expire_dates', mmap_mode=None)
+        self.day_offsets = load('day_offsets', mmap_mode=None)
+        self.day_underlying = load('day_underlying', mmap_mode=None)
+        self.day_c_volume = load('day_c_volume', mmap_mode=None)
+        self.day_p_volume = load('day_p_volume', mmap_mode=None)
+        self._date_index = {d: i for i, d in enumerate(self.quote_dates.tolist())}
+
+    @staticmethod
+    def exists(path=DEFAULT_COLUMNAR_DIR):
+        return os.path.isfile(os.path.join(path, 'meta.json'))
+
+    def last_quote_dates(self, n_dates):
+        return self.quote_dates[-int(n_dates):].tolist()
+
+    # Compared without the padding of OptionsDX dates, as in data_loader.quote_dates_since
+    def quote_dates_since(self, since):
+        return self.quote_dates[np.char.strip(self.quote_dates) >= str(since).strip()].tolist()
+
+    def quote_dates_until(self, until=None):
+        if until is None:
+            return self.quote_dates.tolist()
+        return self.quote_dates[np.char.strip(self.quote_dates) <= str(until).strip()].tolist()
+
+    def day(self, quote_date):
+        """
+        Returns one quote date's chain as a dict of arrays. Numeric columns are
+        views into the memory-mapped files; expiry labels are looked up from codes.
+        """
+        i = self._date_index[quote_date]
+        start, end = self.day_offsets[i], self.day_offsets[i + 1]
+        chain = {name: column[start:end] for name, column in self.columns.items()}
+        chain['expire_date'] = self.expire_dates[chain['expire_code']]
+        return chain
+
+    def daily_summary(self, quote_dates):
+        """
+        Same layout as data_loader.load_daily_summary, from the precomputed day arrays.
+        """
+        idx = [self._date_index[d] for d in quote_dates]
+        return pd.DataFrame({
+            'quote_date': list(quote_dates),
+            'underlying_last': self.day_underlying[idx],
+            'c_volume': self.day_c_volume[idx],
+            'p_volume': self.day_p_volume[idx],
+        })
+
+    def first_underlying(self):
+        return float(self.day_underlying[0]) if len(self.day_underlying) else None
+
+
+def open_if_fresh(path=DEFAULT_COLUMNAR_DIR, db_path=DEFAULT_DB_PATH, table=DEFAULT_TABLE):
+    """
+    Opens the columnar cache if it exists and still ends on the same quote date
+    as the SQLite table; returns None otherwise so callers fall back to SQLite.
+    """
+    if not path or not ColumnarStore.exists(path):
+        return None
+    store = ColumnarStore(path)
+    if os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        try:
+            latest = last_quote_date(conn, table)
+        finally:
+            conn.close()
+        if latest != store.meta['last_quote_date']:
+            print(f"Columnar cache in {path} ends on {store.meta['last_quote_date']} but {db_path} "
+                  f"has {latest}; re-run columnar_store.py. Reading from SQLite instead.")
+            return None
+    return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the spx_data table into a columnar .npy cache.")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="SQLite database with the options table")
+    parser.add_argument('--out', default=DEFAULT_COLUMNAR_DIR, help="Output directory for the columns")
+    parser.add_argument('--table', default=DEFAULT_TABLE, help="Options table name")
+    args = parser.parse_args()
+
+    meta = ingest(args.db, args.out, args.table)
+    print(f"Wrote {meta['n_rows']} rows up to {meta['last_quote_date']} to {args.out}")
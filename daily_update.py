@@ -0,0 +1,27 @@
+import argparse
+
+from columnar_store import DEFAULT_COLUMNAR_DIR
+from data_loader import DEFAULT_DB_PATH, DEFAULT_TABLE
+from main import DEFAULT_TICKER, update_pipeline
+from moment_store import DEFAULT_MOMENT_DB
+from news_store import DEFAULT_NEWS_DB
+from sentiment_store import DEFAULT_SENTIMENT_DB
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score the quote dates added since the last update.")
+    parser.add_argument('--sentiment-db', default=DEFAULT_SENTIMENT_DB, help="Daily sentiment series database")
+    parser.add_argument('--initial-days', type=int, default=10, help="Days scored when the series is empty")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="SQLite database with the options table")
+    parser.add_argument('--table', default=DEFAULT_TABLE, help="Options table name")
+    parser.add_argument('--ticker', default=DEFAULT_TICKER, help="Ticker the news is fetched for")
+    parser.add_argument('--columnar-dir', default=DEFAULT_COLUMNAR_DIR, help="Columnar cache directory")
+    parser.add_argument('--moment-db', default=DEFAULT_MOMENT_DB, help="Moment store database")
+    parser.add_argument('--news-db', default=DEFAULT_NEWS_DB, help="Local news store database")
+    parser.add_argument('--concurrency', type=int, default=1, help="Days scored at once")
+    args = parser.parse_args()
+
+    df_series = update_pipeline(args.sentiment_db, args.initial_days, db_path=args.db,
+                                columnar_dir=args.columnar_dir, moment_db_path=args.moment_db,
+                                news_db_path=args.news_db, concurrency=args.concurrency, ticker=args.ticker,
+                                table=args.table)
+    print(f"Appended {len(df_series.attrs['new_dates'])} quote dates; the series now has {len(df_series)} days")
@@ -0,0 +1,219 @@
+import sqlite3
+import numpy as np
+import pandas as pd
+
+from bl_config import DEFAULT_DB_PATH, DEFAULT_TABLE
+
+# Pipeline column name -> raw column name in the OptionsDX-style SQLite table
+OPTION_COLUMNS = {
+    'quote_date': '" [QUOTE_DATE]"',
+    'expire_date': '" [EXPIRE_DATE]"',
+    'strike': '" [STRIKE]"',
+    'c_last': '" [C_LAST]"',
+    'p_last': '" [P_LAST]"',
+    'dte': '" [DTE]"',
+    'underlying_last': '" [UNDERLYING_LAST]"',
+    'c_volume': '" [C_VOLUME]"',
+    'p_volume': '" [P_VOLUME]"',
+}
+
+# Columns the BL stage needs from each day's chain
+CHAIN_COLUMNS = ('quote_date', 'expire_date', 'strike', 'c_last', 'p_last', 'dte', 'c_volume', 'p_volume')
+
+# Columns that are safe to hold in float32. Strikes and prices stay float64:
+# the BL second derivative amplifies float32 rounding into visible moment drift.
+COMPACT_FLOAT_COLUMNS = ('dte', 'c_volume', 'p_volume')
+
+
+def _select_list(columns):
+    return ',\n        '.join(f'{OPTION_COLUMNS[c]} AS {c}' for c in columns)
+
+
+def ensure_indexes(conn, table=DEFAULT_TABLE):
+    """
+    Creates the (quote_date, expire_date) index the windowed queries rely on.
+    A read-only database simply keeps working without it.
+    """
+    try:
+        conn.execute(
+            f'CREATE INDEX IF NOT EXISTS idx_{table}_quote_expire '
+            f'ON {table} ({OPTION_COLUMNS["quote_date"]}, {OPTION_COLUMNS["expire_date"]})'
+        )
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        print(f"Warning: could not create index on {table}: {e}")
+
+
+def last_quote_dates(conn, n_dates, table=DEFAULT_TABLE):
+    """
+    Returns the last `n_dates` distinct quote dates in ascending order.
+    """
+    rows = conn.execute(
+        f'SELECT DISTINCT {OPTION_COLUMNS["quote_date"]} FROM {table} ORDER BY 1 DESC LIMIT ?',
+        (int(n_dates),)
+    ).fetchall()
+    return [row[0] for row in reversed(rows)]
+
+
+def quote_dates_since(conn, since, table=DEFAULT_TABLE):
+    """
+    Returns the distinct quote dates on or after `since`, in ascending order.
+    Dates are compared without surrounding whitespace (OptionsDX pads them with
+    a leading space) and returned as stored.
+    """
+    rows = conn.execute(
+        f'SELECT DISTINCT {OPTION_COLUMNS["quote_date"]} FROM {table} '
+        f'WHERE TRIM({OPTION_COLUMNS["quote_date"]}) >= ? ORDER BY 1',
+        (str(since).strip(),)
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def quote_dates_until(conn, until=None, table=DEFAULT_TABLE):
+    """
+    Returns the distinct quote dates on or before `until` (all if None), in ascending order.
+    Dates are compared as in quote_dates_since and returned as stored.
+    """
+    query = f'SELECT DISTINCT {OPTION_COLUMNS["quote_date"]} FROM {table}'
+    params = ()
+    if until is not None:
+        query += f' WHERE TRIM({OPTION_COLUMNS["quote_date"]}) <= ?'
+        params = (str(until).strip(),)
+    rows = conn.execute(query + ' ORDER BY 1', params).fetchall()
+    return [row[0] for row in rows]
+
+
+def compact_dtypes(df):
+    """
+    Casts the DTE and volume columns to float32 and the expiry to a categorical.
+    """
+    for column in COMPACT_FLOAT_COLUMNS:
+        if column in df:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('float32')
+    if 'expire_date' in df:
+        df['expire_date'] = df['expire_date'].astype('category')
+    return df
+
+
+def _chain_query(n_dates, max_dte, table, columns=CHAIN_COLUMNS):
+    query = f"""
+    SELECT
+        {_select_list(columns)}
+    FROM {table}
+    WHERE {OPTION_COLUMNS['quote_date']} IN ({','.join('?' * n_dates)})
+    """
+    if max_dte is not None:
+        query += f"    AND {OPTION_COLUMNS['dte']} <= ?\n"
+    query += "    ORDER BY quote_date, expire_date, strike\n"
+    return query
+
+
+def load_options_window(conn, quote_dates, max_dte=None, table=DEFAULT_TABLE, compact=True):
+    """
+    Loads the option chain rows of the given quote dates only.
+
+    Parameters:
+    - conn: sqlite3.Connection to the options database.
+    - quote_dates: list of quote dates to load.
+    - max_dte: float, optional DTE cutoff pushed down into the query.
+    - table: str, options table name.
+    - compact: bool, cast to float32 / categorical expiry.
+
+    Returns:
+    - df: DataFrame sorted by quote_date, expire_date, strike.
+    """
+    quote_dates = list(quote_dates)
+    params = quote_dates + ([max_dte] if max_dte is not None else [])
+    df = pd.read_sql_query(_chain_query(len(quote_dates), max_dte, table), conn, params=params)
+    return compact_dtypes(df) if compact else df
+
+
+def iter_option_days(conn, quote_dates, max_dte=None, table=DEFAULT_TABLE, compact=True,
+                     columns=CHAIN_COLUMNS):
+    """
+    Streams the option chain one quote date at a time, yielding (quote_date, df_day).
+    Each query is served by the quote_date index, so memory stays at one day's chain.
+    """
+    query = _chain_query(1, max_dte, table, columns)
+    for quote_date in quote_dates:
+        params = [quote_date] + ([max_dte] if max_dte is not None else [])
+        df_day = pd.read_sql_query(query, conn, params=params)
+        yield quote_date, compact_dtypes(df_day) if compact else df_day
+
+
+def load_daily_summary(conn, quote_dates, table=DEFAULT_TABLE):
+    """
+    Aggregates the day-level fields over the full chain (no DTE cutoff):
+    the underlying price and total call / put volume per quote date.
+    """
+    quote_dates = list(quote_dates)
+    # SQLite takes bare columns from the MIN(strike) row, matching the first row
+    # of a chain ordered by strike
+    query = f"""
+    SELECT
+        {OPTION_COLUMNS['quote_date']}      AS quote_date,
+        {OPTION_COLUMNS['underlying_last']} AS underlying_last,
+        MIN({OPTION_COLUMNS['strike']})     AS min_strike,
+        SUM({OPTION_COLUMNS['c_volume']})   AS c_volume,
+        SUM({OPTION_COLUMNS['p_volume']})   AS p_volume
+    FROM {table}
+    WHERE {OPTION_COLUMNS['quote_date']} IN ({','.join('?' * len(quote_dates))})
+    GROUP BY quote_date
+    ORDER BY quote_date
+    """
+    df = pd.read_sql_query(query, conn, params=quote_dates)
+    return df.drop(columns='min_strike')
+
+
+def last_quote_date(conn, table=DEFAULT_TABLE):
+    """
+    Returns the most recent quote date in the table (served by the quote_date index).
+    """
+    row = conn.execute(f'SELECT MAX({OPTION_COLUMNS["quote_date"]}) FROM {table}').fetchone()
+    return None if row is None else row[0]
+
+
+def first_underlying(conn, table=DEFAULT_TABLE):
+    """
+    Returns the underlying price on the first quote date in the table, the base
+    that cumulative returns are measured from.
+    """
+    row = conn.execute(
+        f"""
+        SELECT {OPTION_COLUMNS['underlying_last']}, MIN({OPTION_COLUMNS['strike']})
+        FROM {table}
+        WHERE {OPTION_COLUMNS['quote_date']} = (SELECT MIN({OPTION_COLUMNS['quote_date']}) FROM {table})
+        """
+    ).fetchone()
+    return None if row is None else row[0]
+
+
+class DayIndex:
+    """
+    Quote-date offset index over a window of option rows.
+
+    The rows are sorted once by (quote_date, expire_date, strike) and every
+    column is converted to a NumPy array once; day(quote_date) then returns
+    views of that day's rows instead of scanning and copying the frame.
+    """
+
+    SORT_KEYS = ['quote_date', 'expire_date', 'strike']
+
+    def __init__(self, df):
+        df = df.sort_values(self.SORT_KEYS, kind='stable')
+        self.columns = {column: df[column].to_numpy() for column in df.columns}
+        dates = self.columns['quote_date']
+        if len(dates):
+            breaks = np.flatnonzero(dates[1:] != dates[:-1]) + 1
+            starts = np.concatenate(([0], breaks))
+            ends = np.concatenate((breaks, [len(dates)]))
+        else:
+            starts = ends = np.empty(0, dtype=np.intp)
+        self.offsets = {dates[s]: (s, e) for s, e in zip(starts, ends)}
+
+    def day(self, quote_date):
+        """
+        Returns the rows of one quote date as a dict of array views (empty if absent).
+        """
+        start, end = self.offsets.get(quote_date, (0, 0))
+        return {column: values[start:end] for column, values in self.columns.items()}
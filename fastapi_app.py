@@ -1,30 +1,363 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from typing import List, Optional
+import asyncio
+import cProfile
+import datetime
+import io
+import json
+import pstats
+import threading
+import time
 import uvicorn
 import os
-from main import run_pipeline
+from collections import OrderedDict
+from jobs import JobManager
+from metrics import prometheus_text, registry
+from result_stream import (ARROW_MEDIA_TYPE, NDJSON_MEDIA_TYPE, arrow_available, arrow_stream, ndjson_stream,
+                           parse_columns)
+
+# main (pandas, scipy, the BL and LLM code) is imported on the first pipeline
+# request, so the server starts without it; matplotlib only by /chart
 
 app = FastAPI()
 
+# Where ?profile=true runs write their cProfile dumps
+PROFILE_DIR = '/app/profiles'
+PROFILE_TOP_N = 30
+
+# Recent pipeline results kept for /chart, by run parameters
+RESULT_CACHE_SIZE = 32
+RESULT_CACHE_TTL_SECONDS = 3600
+# Parameters that only change how a run executes, not its results
+EXECUTION_PARAMS = ("concurrency",)
+
+# Longest range, in calendar days, one /results request may score
+RESULTS_MAX_DAYS = 366
+
+
+class TickerSpec(BaseModel):
+    """
+    One underlying of a multi-ticker run; unset fields take the defaults of main.ticker_spec.
+    """
+    ticker: str
+    db_path: Optional[str] = None
+    table: Optional[str] = None
+    columnar_dir: Optional[str] = None
+
+
+class UniverseRequest(BaseModel):
+    tickers: List[TickerSpec]
+    n_days: int = 10
+    concurrency: int = 1
+
+
+class JobRequest(BaseModel):
+    n_days: int = 10
+    concurrency: int = 1
+    # Set to score several underlyings in one job (see /run_universe)
+    tickers: Optional[List[TickerSpec]] = None
+
+
+_results = OrderedDict()
+_results_lock = threading.Lock()
+
+
+def _result_key(params):
+    return json.dumps({k: v for k, v in params.items() if k not in EXECUTION_PARAMS}, sort_keys=True)
+
+
+def _cached_result(params):
+    """
+    Returns the cached df_plot of a run with these parameters, or None if
+    there is none younger than RESULT_CACHE_TTL_SECONDS.
+    """
+    key = _result_key(params)
+    with _results_lock:
+        entry = _results.get(key)
+        if entry is None or time.time() - entry[0] > RESULT_CACHE_TTL_SECONDS:
+            return None
+        _results.move_to_end(key)
+        return entry[1]
+
+
+def _run_headless(params, progress_callback=None):
+    """
+    Runs the pipeline without drawing its figure and caches df_plot for /chart.
+    """
+    from main import run_pipeline
+
+    df_plot, _ = run_pipeline(progress_callback=progress_callback, make_plot=False, **params)
+    if df_plot is not None:
+        key = _result_key(params)
+        with _results_lock:
+            _results[key] = (time.time(), df_plot)
+            _results.move_to_end(key)
+            while len(_results) > RESULT_CACHE_SIZE:
+                _results.popitem(last=False)
+    return df_plot
+
+
+def _run_universe(params, progress_callback=None):
+    """
+    Runs main.run_universe and returns the per-ticker records with the run metrics.
+    """
+    from main import run_universe
+
+    params = dict(params)
+    specs = [{k: v for k, v in spec.items() if v is not None} for spec in params.pop("tickers")]
+    results = run_universe(specs, progress_callback=progress_callback, **params)
+    frames = [df for df in results.values() if df is not None]
+    return {
+        "status": "success",
+        "n_days": params["n_days"],
+        "results": {
+            ticker: None if df is None else df.to_dict(orient="records")
+            for ticker, df in results.items()
+        },
+        "metrics": frames[0].attrs.get("metrics") if frames else None
+    }
+
+
+def _pipeline_job(params, progress_callback):
+    params = dict(params)
+    if params.get("tickers"):
+        return _run_universe(params, progress_callback)
+    params.pop("tickers", None)
+    df_plot = _run_headless(params, progress_callback)
+    if df_plot is None:
+        return {"status": "No data or not enough days to run pipeline."}
+    return {
+        "status": "success",
+        "n_days": params["n_days"],
+        "data": df_plot.to_dict(orient="records"),
+        "metrics": df_plot.attrs.get("metrics")
+    }
+
+
+# Background executor for pipeline runs; identical concurrent requests share a job
+job_manager = JobManager(_pipeline_job)
+
+# Incremental updates append to one series, so they run one at a time
+update_lock = threading.Lock()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the BL + News Analysis API."}
 
+def _profiled(func, *args, **kwargs):
+    """
+    Runs `func` under cProfile, dumps the stats to PROFILE_DIR and returns
+    (result, profile summary).
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"run_pipeline_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.prof")
+    profiler.dump_stats(path)
+
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    return result, {"path": path, "top": text.getvalue()}
+
+
 @app.get("/run_pipeline")
-def run_pipeline_endpoint(n_days: int = 10):
+def run_pipeline_endpoint(n_days: int = 10, profile: bool = False):
     """
-    Run the pipeline for the last `n_days`. Returns a JSON with summarized data.
+    Run the pipeline for the last `n_days`. Returns a JSON with summarized data
+    and the run's stage metrics; `profile=true` also returns a cProfile summary.
+    cProfile only sees the calling thread: the thread pool of batched LLM
+    calls, the work concurrent runs hand to asyncio.to_thread and the backfill
+    worker processes are missing from it (the stage metrics cover those).
     """
-    df_plot, _ = run_pipeline(n_days=n_days)
+    if profile:
+        df_plot, profile_info = _profiled(_run_headless, {"n_days": n_days})
+    else:
+        df_plot = _run_headless({"n_days": n_days})
     if df_plot is None:
         return {"status": "No data or not enough days to run pipeline."}
 
     # Convert the final DataFrame to a list of records
     records = df_plot.to_dict(orient="records")
-    return {
+    response = {
         "status": "success",
         "n_days": n_days,
-        "data": records
+        "data": records,
+        "metrics": df_plot.attrs.get("metrics")
     }
+    if profile:
+        response["profile"] = profile_info
+    return response
+
+
+def _parse_date(name, value):
+    if value is None:
+        return None
+    try:
+        return datetime.date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be a YYYY-MM-DD date, got {value!r}")
+
+
+@app.get("/results")
+def results_endpoint(start: Optional[str] = None, end: Optional[str] = None, n_days: int = 10,
+                     columns: Optional[str] = None, fmt: str = Query("ndjson", alias="format"),
+                     concurrency: int = 1):
+    """
+    Streams per-day results for the quote dates from `start` to `end` (inclusive)
+    while the pipeline runs (see main.iter_pipeline). Without `start` the last
+    `n_days` quote dates up to `end` are scored, as in /run_pipeline. A range
+    spans at most RESULTS_MAX_DAYS calendar days; an open `end` stops there.
+    Each row holds the day's per-expiry call / put BL moments, PCR, volumes,
+    news score, combined score and cumulative values. `columns` is a
+    comma-separated subset of result_stream.RESULT_COLUMNS.
+    `format=ndjson` sends one JSON object per line; `format=arrow` an Arrow IPC
+    stream (requires pyarrow).
+    """
+    try:
+        selected = parse_columns(columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    start, end = _parse_date("start", start), _parse_date("end", end)
+    if start is None:
+        if not 1 <= n_days <= RESULTS_MAX_DAYS:
+            raise HTTPException(status_code=400, detail=f"n_days must be between 1 and {RESULTS_MAX_DAYS}")
+    else:
+        last = (datetime.date.fromisoformat(start) + datetime.timedelta(days=RESULTS_MAX_DAYS - 1)).isoformat()
+        if end is None:
+            end = last
+        elif end > last:
+            raise HTTPException(status_code=400,
+                                detail=f"The range from start to end may span at most {RESULTS_MAX_DAYS} days")
+    if fmt not in ("ndjson", "arrow"):
+        raise HTTPException(status_code=400, detail=f"Unknown format {fmt!r}; use ndjson or arrow")
+    if fmt == "arrow" and not arrow_available():
+        raise HTTPException(status_code=501, detail="Arrow output requires pyarrow, which is not installed")
+
+    from main import STREAM_CHUNK_DAYS, iter_pipeline
+
+    rows = iter_pipeline(start=start, end=end, concurrency=concurrency, n_days=None if start else n_days)
+    if fmt == "arrow":
+        return StreamingResponse(arrow_stream(rows, selected, STREAM_CHUNK_DAYS), media_type=ARROW_MEDIA_TYPE)
+    return StreamingResponse(ndjson_stream(rows, selected), media_type=NDJSON_MEDIA_TYPE)
+
+
+@app.post("/run_universe")
+def run_universe_endpoint(request: UniverseRequest):
+    """
+    Runs the pipeline for several underlyings in one scheduled run that shares
+    database connections, caches, the HTTP client and the LLM concurrency
+    budget (see main.run_universe). Returns the records of every ticker
+    (null for tickers without enough data) and the metrics of the run.
+    """
+    try:
+        return _run_universe(request.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/update")
+def update_endpoint(initial_days: int = 10):
+    """
+    Scores only the quote dates added since the last update and appends them to
+    the stored daily sentiment series (see main.update_pipeline); meant for the
+    nightly job. Returns the new rows.
+    """
+    from main import update_pipeline
+
+    with update_lock:
+        df_series = update_pipeline(initial_days=initial_days)
+    new_dates = df_series.attrs["new_dates"]
+    new_rows = df_series[df_series["quote_date"].isin(new_dates)]
+    return {
+        "status": "success",
+        "new_dates": new_dates,
+        "data": new_rows.to_dict(orient="records"),
+        "metrics": df_series.attrs["metrics"]
+    }
+
+
+@app.get("/chart")
+def chart_endpoint(n_days: int = 10):
+    """
+    PNG of cumulative return vs. cumulative sentiment for the last `n_days`.
+    Reuses the df_plot of a recent run with the same parameters (from
+    /run_pipeline, a job or an earlier chart) and only runs the pipeline if
+    there is none. Rendered off-screen with the Agg backend.
+    """
+    params = {"n_days": n_days}
+    df_plot = _cached_result(params)
+    if df_plot is None:
+        df_plot = _run_headless(params)
+    if df_plot is None:
+        raise HTTPException(status_code=404, detail="No data or not enough days to run pipeline.")
+
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from main import plot_results
+
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    plot_results(df_plot, n_days, fig)
+    png = io.BytesIO()
+    fig.savefig(png, format="png")
+    return Response(content=png.getvalue(), media_type="image/png")
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """
+    Prometheus text exposition of the stage timings, cache lookups and token
+    usage summed over every pipeline run of this process.
+    """
+    return PlainTextResponse(prometheus_text(registry), media_type="text/plain; version=0.0.4")
+
+@app.post("/jobs")
+def submit_job(request: JobRequest):
+    """
+    Queues a pipeline run and returns its job id immediately.
+    """
+    job = job_manager.submit(request.model_dump())
+    return job.snapshot(include_result=False)
+
+
+def _get_job_or_404(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job id: {job_id}")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Returns the job status and progress, plus the results once it is done.
+    """
+    return _get_job_or_404(job_id).snapshot()
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-Sent Events stream of the job's progress; the last event carries the result.
+    """
+    job = _get_job_or_404(job_id)
+
+    async def events():
+        last_version = -1
+        while True:
+            if job.version != last_version:
+                last_version = job.version
+                finished = job.finished
+                yield f"event: {job.status}\ndata: {json.dumps(job.snapshot(include_result=finished))}\n\n"
+                if finished:
+                    break
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
 
 if __name__ == "__main__":
     # This launches the FastAPI server on localhost:8000 by default
@@ -0,0 +1,113 @@
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Job:
+    """
+    One queued pipeline run. `version` increases on every state or progress
+    change, so event streams can tell when there is something new to send.
+    """
+
+    def __init__(self, params):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.status = QUEUED
+        self.progress = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def snapshot(self, include_result=True):
+        with self._lock:
+            state = {
+                'job_id': self.id,
+                'status': self.status,
+                'progress': self.progress,
+                'params': self.params,
+            }
+            if self.error is not None:
+                state['error'] = self.error
+            if include_result and self.status == DONE:
+                state['result'] = self.result
+            return state
+
+
+class JobManager:
+    """
+    Runs pipeline jobs on a background thread pool.
+
+    `runner(params, progress_callback)` does the actual work and returns a
+    JSON-serializable result. Submitting parameters identical to a job that is
+    still queued or running returns that job instead of starting a new one.
+    Only the most recent `max_finished` finished jobs are kept.
+    """
+
+    def __init__(self, runner, max_workers=2, max_finished=100):
+        self.runner = runner
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pipeline-job')
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _dedupe_key(params):
+        return json.dumps(params, sort_keys=True)
+
+    def submit(self, params):
+        key = self._dedupe_key(params)
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None:
+                return job
+
+            job = Job(params)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self._prune()
+
+        self._executor.submit(self._run, job, key)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, key):
+        job.update(status=RUNNING)
+        try:
+            result = self.runner(job.params, lambda pct: job.update(progress=pct))
+            job.update(status=DONE, progress=100, result=result, finished_at=time.time())
+        except Exception as e:
+            job.update(status=FAILED, error=str(e), finished_at=time.time())
+        finally:
+            with self._lock:
+                if self._active.get(key) is job:
+                    del self._active[key]
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+DEFAULT_LLM_CACHE_DB = '/app/llm_cache.db'
+
+# Scores for historical days do not change, so entries stay fresh for a long time
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 20000
+# Share of max_entries freed per eviction, so evictions stay rare
+EVICT_FRACTION = 0.1
+
+
+class ResponseCache:
+    """
+    Persistent, content-addressed cache of parsed LLM responses.
+
+    Entries are keyed on a SHA-256 of (model, system message, rendered prompt,
+    response_format schema), which fully determines a temperature-0 request.
+    Entries older than `ttl_seconds` are not served as hits but are kept as a
+    fallback for when the API errors. Once more than `max_entries` are stored,
+    the least recently used ones are evicted in one batch, down to
+    `max_entries` less EVICT_FRACTION of it.
+
+    Any SQLite problem (e.g. the cache directory is missing) degrades to a miss.
+    """
+
+    def __init__(self, db_path=DEFAULT_LLM_CACHE_DB, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+        # Upper bound on the stored entries, recounted only when it exceeds max_entries
+        self._size = None
+
+    @staticmethod
+    def make_key(model, messages, response_format=None):
+        """
+        Hashes the model, the system and user messages, and the JSON schema of
+        `response_format` (a Pydantic model class or None).
+        """
+        schema = response_format.model_json_schema() if response_format is not None else None
+        payload = json.dumps([model, messages, schema], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        if not self._initialized:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    key        TEXT PRIMARY KEY,
+                    value      TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used  REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_responses_last_used ON llm_responses (last_used)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key, allow_stale=False):
+        """
+        Returns the cached value, or None on a miss. Expired entries are only
+        returned when `allow_stale` is set (the API-error fallback).
+        """
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT value, created_at FROM llm_responses WHERE key = ?",
+                                   (key,)).fetchone()
+                if row is None:
+                    value = None
+                else:
+                    value, created_at = row
+                    if not allow_stale and time.time() - created_at > self.ttl_seconds:
+                        value = None
+                if value is not None:
+                    conn.execute("UPDATE llm_responses SET last_used = ? WHERE key = ?", (time.time(), key))
+                    conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Warning: LLM cache unavailable ({e})")
+            value = None
+
+        if value is None:
+            if not allow_stale:
+                self._count('misses')
+            return None
+        self._count('stale_hits' if allow_stale else 'hits')
+        return json.loads(value)
+
+    def put(self, key, value):
+        """
+        Stores a JSON-serializable value. Once the cache holds more than
+        `max_entries`, the least recently used entries are evicted in a batch.
+        """
+        now = time.time()
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("INSERT OR REPLACE INTO llm_responses VALUES (?, ?, ?, ?)",
+                             (key, json.dumps(value), now, now))
+                with self._lock:
+                    # Replacing an existing key also counts, so _size may overestimate
+                    self._size = self._size + 1 if self._size is not None else None
+                    check = self._size is None or self._size > self.max_entries
+                if check:
+                    self._evict(conn)
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Warning: LLM cache unavailable ({e})")
+
+    def _evict(self, conn):
+        """
+        Recounts the entries and, if there are more than `max_entries`, deletes
+        the least recently used ones down to max_entries * (1 - EVICT_FRACTION).
+        """
+        size = conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        if size > self.max_entries:
+            excess = size - int(self.max_entries * (1 - EVICT_FRACTION))
+            conn.execute("""
+                DELETE FROM llm_responses WHERE key IN (
+                    SELECT key FROM llm_responses ORDER BY last_used LIMIT ?
+                )
+            """, (excess,))
+            size -= excess
+        with self._lock:
+            self._size = size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale_hits': self.stale_hits,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
@@ -1,170 +1,475 @@
+import asyncio
+import bisect
+import contextvars
+import queue
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import httpx
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from tqdm import tqdm
-from BL_dynamics import compute_risk_neutral_pdfs
-from news_api_wrapper import get_news
-from news_analysis import analyze_news, get_score_from_news
+from BL_dynamics import compute_chain_moments, moment_cache
+from backfill import backfill_moments
+from bl_config import BL_PARAMS, MAX_DTE, PREV_DAY_DTE_MARGIN
+from bl_payload import ESTIMATOR_SUFFIX, SIDES, format_bl_table
+from columnar_store import DEFAULT_COLUMNAR_DIR, open_if_fresh
+from data_loader import (DEFAULT_DB_PATH, DEFAULT_TABLE, DayIndex, ensure_indexes, first_underlying,
+                         iter_option_days, last_quote_dates, load_daily_summary, load_options_window,
+                         quote_dates_since, quote_dates_until)
+from metrics import PipelineMetrics, collecting, registry
+from moment_store import DEFAULT_MOMENT_DB, MOMENT_FIELDS, MomentStore, params_version, source_scope
+from news_store import DEFAULT_NEWS_DB, NewsStore
+from sentiment_store import DEFAULT_SENTIMENT_DB, SentimentStore
+from news_api_wrapper import REQUEST_TIMEOUT, get_news, get_news_async
+from news_analysis import (analyze_news, analyze_news_async, analyze_news_batch, get_score_from_news,
+                           get_score_from_news_async, get_score_from_news_batch,
+                           async_llm_client, response_cache)
+
+# News ticker of the default data source (the spx_data table)
+DEFAULT_TICKER = 'SPY'
+
+# Quote dates loaded and scored per step of iter_pipeline; bounds its memory use
+STREAM_CHUNK_DAYS = 20
+
+
+def get_day_moments(df_day, quote_date, expire_dates, stored, store, version, metrics=None,
+                    bl_params=BL_PARAMS):
+    """
+    Returns {expire_date: {'call': moments, 'put': moments}} for one quote date.
 
-def run_pipeline(n_days=10, progress_callback=None):
+    `df_day` must be sorted by (expire_date, strike), as every day source is.
+    Slices already in `stored` (bulk-read from the moment store) are reused; only
+    the missing expiries are computed, and those are written back to the store.
+    Store and cache hits and misses are counted in `metrics`, if given. `bl_params` are
+    the compute_chain_moments settings, and must match `version`.
     """
-    Runs the pipeline for the last `n_days` of data.
-    Returns:
-      - df_plot: A DataFrame containing the date, cumulative returns, and cumulative sentiment
-                 for the last n_days.
-      - fig:     A Matplotlib Figure object with the 2-axis plot.
-    """
-
-    # Connect to SQLite database (adjust path if needed)
-    db_path = '/app/spx_data.db'
-    conn = sqlite3.connect(db_path)
-
-    # Query to load options data
-    query = """
-    SELECT
-        " [QUOTE_DATE]"   AS quote_date,
-        " [EXPIRE_DATE]"  AS expire_date,
-        " [STRIKE]"       AS strike,
-        " [C_LAST]"       AS c_last,
-        " [P_LAST]"       AS p_last,
-        " [DTE]"          AS dte,
-        " [UNDERLYING_LAST]" AS underlying_last,
-        " [C_VOLUME]"     AS c_volume,
-        " [P_VOLUME]"     AS p_volume
-    FROM spx_data
-    ORDER BY quote_date, strike
-    """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-
-    # Unique dates
-    unique_dates = df['quote_date'].drop_duplicates().values
+    day_stored = stored.setdefault(quote_date, {})
+    missing = [e for e in expire_dates if e not in day_stored]
+    if metrics is not None:
+        metrics.cache('moment_store', len(expire_dates) - len(missing), len(missing))
+    if missing:
+        computed = compute_chain_moments(
+            df_day['strike'], df_day['c_last'], df_day['p_last'], df_day['dte'], df_day['expire_date'],
+            expire_dates=missing, quote_date=quote_date, cache=moment_cache, presorted=True, metrics=metrics,
+            **bl_params
+        )
+        store.save(version, quote_date, computed)
+        day_stored.update(computed)
+    return {e: day_stored[e] for e in expire_dates if e in day_stored}
 
-    if len(unique_dates) < 2:
-        print("Not enough distinct dates to process.")
-        return None, None
 
-    # We'll store a daily 'combined sentiment' (from BKM + news) in this dict
-    daily_sentiment_scores = {}
+def score_day(payload, ticker=DEFAULT_TICKER, news_lookup=None, metrics=None):
+    """
+    Fetches the news for one day's BL payload and runs both LLM calls on it.
+    `news_lookup(date, ticker)` replaces the live get_news call (e.g. NewsStore.get_news).
+    Each step is timed as a stage of `metrics`, if given.
+    Returns (news_score, combined_score).
+    """
+    metrics = metrics or PipelineMetrics()
+    day = payload['quote_date']
+
+    # Fetch relevant news for date t
+    with metrics.stage('news_fetch', day):
+        news_dict = (news_lookup or get_news)(day, ticker=ticker)
+
+    # First layer of sentiment extraction
+    with metrics.stage('llm_news', day):
+        new_analysis_step_1 = get_score_from_news(news_dict, ticker)
+
+    # LLM-based function to combine BKM + news
+    with metrics.stage('llm_analysis', day):
+        return analyze_news(
+            payload['bl_data'],
+            ticker=ticker,
+            news_analysis=new_analysis_step_1,
+            pcr_data=payload['pcr'],
+            call_volume=payload['call_volume'],
+            put_volume=payload['put_volume']
+        )
 
-    # Define the start index for the last n days
-    start_idx = len(unique_dates) - n_days
-    if start_idx < 1:
-        start_idx = 1  # ensure we have at least one prior day to compare
 
-    # The loop will run from day index (start_idx) up to the last day
-    total_iters = len(unique_dates) - start_idx
-    current_iter = 0
+async def score_days_async(payloads, ticker=DEFAULT_TICKER, max_concurrency=8, on_done=None, news_lookup=None,
+                           metrics=None, semaphore=None, http=None, llm=None):
+    """
+    Runs score_day's news fetch and LLM calls for all days concurrently, with at
+    most `max_concurrency` days in flight. News requests share one pooled HTTP
+    client, unless `news_lookup` serves them locally; it runs in a worker thread.
+    `on_done(payload, scores)` is called as each day finishes.
+    Passing `semaphore`, `http` and `llm` shares the in-flight budget, the
+    HTTP client and the OpenAI client with other calls on the same event loop
+    (see run_universe); otherwise both clients are opened for this call.
+    Returns the (news_score, combined_score) tuples in payload order.
+    """
+    metrics = metrics or PipelineMetrics()
+    if http is None or llm is None:
+        limits = httpx.Limits(max_connections=max_concurrency)
+        async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT, limits=limits) as http, async_llm_client() as llm:
+            return await score_days_async(payloads, ticker, max_concurrency, on_done, news_lookup, metrics,
+                                          semaphore, http, llm)
+    semaphore = semaphore or asyncio.Semaphore(max_concurrency)
+
+    async def score(payload):
+        day = payload['quote_date']
+        async with semaphore:
+            with metrics.stage('news_fetch', day, cpu=False):
+                if news_lookup is not None:
+                    # SQLite reads, and possibly a download of a missing range: off the event loop
+                    news_dict = await asyncio.to_thread(news_lookup, day, ticker=ticker)
+                else:
+                    news_dict = await get_news_async(day, ticker, http)
+            with metrics.stage('llm_news', day, cpu=False):
+                new_analysis_step_1 = await get_score_from_news_async(news_dict, ticker, llm=llm)
+            with metrics.stage('llm_analysis', day, cpu=False):
+                scores = await analyze_news_async(
+                    payload['bl_data'],
+                    ticker=ticker,
+                    news_analysis=new_analysis_step_1,
+                    pcr_data=payload['pcr'],
+                    call_volume=payload['call_volume'],
+                    put_volume=payload['put_volume'],
+                    llm=llm
+                )
+        if on_done:
+            on_done(payload, scores)
+        return scores
+
+    return await asyncio.gather(*(score(payload) for payload in payloads))
+
+
+def score_batch(payloads, ticker=DEFAULT_TICKER, news_lookup=None, metrics=None):
+    """
+    Scores several days with one news-classification request and one analysis
+    request instead of two requests per day. Days the batch responses do not
+    cover fall back to single-day calls inside news_analysis.
+    Returns the (news_score, combined_score) tuples in payload order.
+    """
+    metrics = metrics or PipelineMetrics()
+    news_by_date = {}
+    for payload in payloads:
+        with metrics.stage('news_fetch', payload['quote_date']):
+            news_by_date[payload['quote_date']] = (news_lookup or get_news)(payload['quote_date'], ticker=ticker)
+
+    with metrics.stage('llm_news_batch'):
+        news_analyses = get_score_from_news_batch(news_by_date, ticker)
+
+    with metrics.stage('llm_analysis_batch'):
+        scores = analyze_news_batch([
+            {
+                'quote_date': payload['quote_date'],
+                'bl_data': payload['bl_data'],
+                'news_analysis': news_analyses[payload['quote_date']],
+                'pcr_data': payload['pcr'],
+                'call_volume': payload['call_volume'],
+                'put_volume': payload['put_volume']
+            }
+            for payload in payloads
+        ], ticker)
+    return [scores[payload['quote_date']] for payload in payloads]
+
+
+def open_source(db_path=DEFAULT_DB_PATH, columnar_dir=DEFAULT_COLUMNAR_DIR, table=DEFAULT_TABLE,
+                connections=None):
+    """
+    Returns (columns, conn): the columnar cache if it is up to date with
+    `db_path`, otherwise an indexed SQLite connection; the other one is None.
+    `connections` (dict db_path -> connection) pools the connections of several
+    calls, e.g. for tables of one database; the caller then closes them.
+    """
+    columns = open_if_fresh(columnar_dir, db_path, table)
+    if columns is not None:
+        return columns, None
+    conn = connections.get(db_path) if connections is not None else None
+    if conn is None:
+        # Connect to SQLite database (adjust path if needed)
+        conn = sqlite3.connect(db_path)
+        if connections is not None:
+            connections[db_path] = conn
+    ensure_indexes(conn, table)
+    return None, conn
+
+
+def load_days(quote_dates, columns=None, conn=None, max_dte=MAX_DTE, stream=False, table=DEFAULT_TABLE):
+    """
+    Loads the given quote dates from the columnar cache, or from `table` of `conn`.
+
+    Returns:
+    - df_summary: DataFrame of the day-level underlying price and volumes, indexed by quote_date.
+    - days: iterator of (quote_date, chain) in date order. Chains are sorted by
+            (expire_date, strike); with `stream=True` each is read from SQLite
+            when it is reached, so `conn` must stay open until then.
+    """
+    if columns is not None:
+        df_summary = columns.daily_summary(quote_dates).set_index('quote_date')
+        return df_summary, ((d, columns.day(d)) for d in quote_dates)
+
+    # Day-level underlying price and volumes over the full chain
+    df_summary = load_daily_summary(conn, quote_dates, table).set_index('quote_date')
 
-    for i in range(start_idx, len(unique_dates)):
-        # if we’re at i=0 (edge case), skip
-        if i == 0:
-            continue
-        # Each iteration compares day (i-1) vs. day (i)
-        if i == 0:
-            continue
+    # Option rows for the window only; day t-1 needs a few more DTE than day t
+    load_max_dte = None if max_dte is None else max_dte + PREV_DAY_DTE_MARGIN
+    if stream:
+        return df_summary, iter_option_days(conn, quote_dates, max_dte=load_max_dte, table=table)
 
-        t_minus_1 = unique_dates[i - 1]
-        t = unique_dates[i]
+    df = load_options_window(conn, quote_dates, max_dte=load_max_dte, table=table)
+    # Sort once and slice each day out of the offset index (views, no scans)
+    index = DayIndex(df)
+    return df_summary, ((d, index.day(d)) for d in quote_dates)
 
-        df_t_minus_1 = df[df['quote_date'] == t_minus_1]
-        df_t         = df[df['quote_date'] == t]
 
-        if df_t_minus_1.empty or df_t.empty:
-            continue
+def build_payloads(days, df_summary, stored_moments, store, version, max_dte=MAX_DTE, bl_params=BL_PARAMS,
+                   compact_bl=True, metrics=None):
+    """
+    Stage 1: BL estimators and volume metrics for every day after the first.
 
-        # Focus on near-term expirations (≤ 10 DTE), if desired
-        expiration_dates = df_t.loc[df_t['dte'] <= 10, 'expire_date'].drop_duplicates().values
+    Each day t is compared with the day before it in `days`. A day whose chain
+    has no quotes within the DTE cutoff (on day t or t-1) is still scored, with
+    an empty set of BL estimators. BL moments come from `stored_moments` /
+    `store` (see get_day_moments).
+    Returns the list of per-day payloads scored by stage 2.
+    """
+    metrics = metrics or PipelineMetrics()
+    payloads = []
+
+    # Each iteration compares day t-1 vs. day t
+    t_minus_1, df_t_minus_1 = next(days)
+    for t, df_t in days:
+        # Focus on near-term expirations (≤ max_dte), if desired
+        expiration_dates = np.asarray(df_t['expire_date'])
+        if max_dte is not None:
+            expiration_dates = expiration_dates[np.asarray(df_t['dte']) <= max_dte]
+        expiration_dates = np.unique(expiration_dates)
 
         resultik = {}
         try:
-            for expiration_date in expiration_dates:
-                df_t_given_exp = df_t[df_t['expire_date'] == expiration_date]
-                df_t_minus_1_given_exp = df_t_minus_1[df_t_minus_1['expire_date'] == expiration_date]
-
-                # Compute BL for calls
-                call_data_t, call_data_t_minus_1 = compute_risk_neutral_pdfs(
-                    df_t_given_exp['c_last'],
-                    df_t_given_exp['strike'],
-                    df_t_minus_1_given_exp['c_last'],
-                    df_t_minus_1_given_exp['strike'],
-                    df_t_given_exp['dte'].iloc[-1] / 252,
-                    df_t_minus_1_given_exp['dte'].iloc[-1] / 252
-                )
-                # Compute BL for puts
-                put_data_t, put_data_t_minus_1 = compute_risk_neutral_pdfs(
-                    df_t_given_exp['p_last'],
-                    df_t_given_exp['strike'],
-                    df_t_minus_1_given_exp['p_last'],
-                    df_t_minus_1_given_exp['strike'],
-                    df_t_given_exp['dte'].iloc[-1] / 252,
-                    df_t_minus_1_given_exp['dte'].iloc[-1] / 252
-                )
+            # Day t-1 was day t of the previous iteration (or of an earlier run),
+            # so it comes from the moment store or the in-process cache
+            with metrics.stage('bl_moments', t):
+                chain_t = get_day_moments(df_t, t, expiration_dates, stored_moments, store, version,
+                                          metrics, bl_params)
+                # Days are DataFrames or dicts of arrays (columnar cache), so check lengths
+                chain_t_minus_1 = {}
+                if len(df_t_minus_1['strike']):
+                    chain_t_minus_1 = get_day_moments(df_t_minus_1, t_minus_1, expiration_dates,
+                                                      stored_moments, store, version, metrics, bl_params)
+
+            for expiration_date, moments_t in chain_t.items():
+                # Skip expiries that were not quoted yet on day t-1
+                moments_t_minus_1 = chain_t_minus_1.get(expiration_date)
+                if moments_t_minus_1 is None:
+                    continue
 
                 bl_estimators = {
-                    "call_data_t": call_data_t,
-                    "call_data_t_minus_1": call_data_t_minus_1,
-                    "put_data_t": put_data_t,
-                    "put_data_t_minus_1": put_data_t_minus_1
+                    "call_data_t": moments_t['call'],
+                    "call_data_t_minus_1": moments_t_minus_1['call'],
+                    "put_data_t": moments_t['put'],
+                    "put_data_t_minus_1": moments_t_minus_1['put']
                 }
                 resultik[f'{expiration_date}_bl_estimators'] = bl_estimators
 
 
         except Exception as e:
             print(f"Error {e}")
-        
-        current_iter += 1
+            metrics.count('bl_errors')
+
+        # Parse volume-based metrics for day t
+        total_call_vol = df_summary.at[t, 'c_volume']
+        total_put_vol  = df_summary.at[t, 'p_volume']
+        pcr_data = total_put_vol / total_call_vol if total_call_vol != 0 else np.nan
+
+        payloads.append({
+            'quote_date': t,
+            'bl_estimators': resultik,
+            'bl_data': format_bl_table(resultik) if compact_bl else resultik,
+            'pcr': pcr_data,
+            'call_volume': total_call_vol,
+            'put_volume': total_put_vol
+        })
+        t_minus_1, df_t_minus_1 = t, df_t
+
+    metrics.count('days', len(payloads))
+    metrics.count('expiries', sum(len(payload['bl_estimators']) for payload in payloads))
+    return payloads
+
+
+def news_lookup_for(payloads, ticker=DEFAULT_TICKER, news_db_path=DEFAULT_NEWS_DB, metrics=None):
+    """
+    Returns the news lookup of `ticker` for scoring `payloads`: NewsStore.get_news
+    once the store covers their dates, or None (live fetches) without a store.
+    """
+    if not news_db_path or not payloads:
+        return None
+    metrics = metrics or PipelineMetrics()
+    # One bulk download covers the two-day news window of every scored day
+    news_store = NewsStore(news_db_path)
+    with metrics.stage('news_prefetch'):
+        news_store.prefetch(ticker, [payload['quote_date'] for payload in payloads])
+    return news_store.get_news
+
+
+def score_payloads(payloads, on_done, concurrency=1, llm_batch_size=1, news_db_path=DEFAULT_NEWS_DB,
+                   metrics=None, ticker=DEFAULT_TICKER):
+    """
+    Stage 2: news + LLM scoring of every payload; `on_done(payload, scores)` is
+    called in this thread as each day (or batch of days) finishes.
+    """
+    metrics = metrics or PipelineMetrics()
+    news_lookup = news_lookup_for(payloads, ticker, news_db_path, metrics)
+
+    llm_stats = response_cache.stats()
+    # Token usage of the LLM calls below is reported to this run's metrics
+    with collecting(metrics):
+        if llm_batch_size > 1:
+            batches = [payloads[i:i + llm_batch_size] for i in range(0, len(payloads), llm_batch_size)]
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+                futures = {
+                    executor.submit(contextvars.copy_context().run, score_batch, batch, ticker,
+                                    news_lookup=news_lookup, metrics=metrics): batch
+                    for batch in batches
+                }
+                for future in as_completed(futures):
+                    for payload, scores in zip(futures[future], future.result()):
+                        on_done(payload, scores)
+        elif concurrency > 1:
+            asyncio.run(score_days_async(payloads, ticker, max_concurrency=concurrency, on_done=on_done,
+                                         news_lookup=news_lookup, metrics=metrics))
+        else:
+            for payload in payloads:
+                on_done(payload, score_day(payload, ticker, news_lookup=news_lookup, metrics=metrics))
+    llm_stats_after = response_cache.stats()
+    metrics.cache('llm_responses', llm_stats_after['hits'] - llm_stats['hits'],
+                  llm_stats_after['misses'] - llm_stats['misses'])
+
+
+def progress_reporter(total, progress_callback=None, on_scores=None):
+    """
+    Returns an on_done(payload, scores) callback for score_payloads that prints
+    each day's scores, passes them to `on_scores(payload, scores)` and reports
+    the percentage of the `total` days done to `progress_callback`.
+    """
+    done = 0
+
+    def on_done(payload, scores):
+        nonlocal done
+        news_score, combined_score = scores
+        if on_scores:
+            on_scores(payload, scores)
+        # Multi-ticker runs tag their payloads with the ticker
+        label = f"{payload['ticker']} {payload['quote_date']}" if 'ticker' in payload else payload['quote_date']
+        print(f"[{label}] PCR={payload['pcr']:.3f}, News Score={news_score}, "
+              f"Combined Score={combined_score}")
+
+        done += 1
         if progress_callback:
-            pct = int((current_iter / total_iters) * 100)
+            pct = int((done / total) * 100)
             progress_callback(pct)
 
-        # Fetch relevant news for date t
-        news_dict = get_news(t, ticker="SPY")
+    return on_done
 
-        # First layer of sentiment extraction
-        new_analysis_step_1 = get_score_from_news(news_dict, 'SPY')
 
-        # Parse volume-based metrics for day t
-        total_call_vol = df_t['c_volume'].sum()
-        total_put_vol  = df_t['p_volume'].sum()
-        pcr_data = total_put_vol / total_call_vol if total_call_vol != 0 else np.nan
+def window_dates(n_days, columns=None, conn=None, table=DEFAULT_TABLE):
+    """
+    Unique quote dates of a run_pipeline window: the last `n_days` plus the day before them.
+    """
+    return (columns.last_quote_dates(n_days + 1) if columns is not None
+            else last_quote_dates(conn, n_days + 1, table))
 
-        # LLM-based function to combine BKM + news
-        news_score, combined_score = analyze_news(
-            resultik,
-            ticker="SPY",
-            news_analysis=new_analysis_step_1,
-            pcr_data=pcr_data,
-            call_volume=total_call_vol,
-            put_volume=total_put_vol
-        )
 
-        daily_sentiment_scores[t] = combined_score
-        print(f"[{t}] PCR={pcr_data:.3f}, News Score={news_score}, Combined Score={combined_score}")
+def build_window(n_days, columns=None, conn=None, moment_db_path=DEFAULT_MOMENT_DB, db_path=DEFAULT_DB_PATH,
+                 max_dte=MAX_DTE, stream=False, columnar_dir=DEFAULT_COLUMNAR_DIR, workers=None,
+                 compact_bl=True, metrics=None, bl_params=BL_PARAMS, ticker=DEFAULT_TICKER, table=DEFAULT_TABLE,
+                 unique_dates=None):
+    """
+    Stage 1 of run_pipeline for one data source (as returned by open_source):
+    selects the last `n_days` quote dates plus the day before them and builds
+    their BL payloads. Dates already selected with window_dates can be passed
+    as `unique_dates`. The other parameters are those of run_pipeline.
+
+    Returns:
+    - window: dict with the scored 'payloads', the 'df_summary' of every loaded
+              date, the 'relevant_dates' reported and the 'base_underlying' of
+              the table; None if there are fewer than two quote dates.
+    """
+    metrics = metrics or PipelineMetrics()
+
+    if unique_dates is None:
+        with metrics.stage('load_dates'):
+            unique_dates = window_dates(n_days, columns, conn, table)
+
+    if len(unique_dates) < 2:
+        print("Not enough distinct dates to process.")
+        return None
+
+    with metrics.stage('load_chains'):
+        df_summary, days = load_days(unique_dates, columns, conn, max_dte, stream, table)
+        base_underlying = columns.first_underlying() if columns is not None else first_underlying(conn, table)
 
+    # Define the start index for the last n days
+    start_idx = len(unique_dates) - n_days
+    if start_idx < 1:
+        start_idx = 1  # ensure we have at least one prior day to compare
+
+    if workers and workers > 1:
+        with metrics.stage('backfill'):
+            backfill_moments(unique_dates[start_idx - 1:], workers=workers, db_path=db_path, table=table,
+                             columnar_dir=columnar_dir, moment_db_path=moment_db_path, max_dte=max_dte,
+                             bl_params=bl_params)
+
+    # Bulk-read every BL slice already computed for this window (day t-1 included)
+    store = MomentStore(moment_db_path)
+    version = params_version(**bl_params, source=source_scope(db_path, table))
+    with metrics.stage('moment_store_load'):
+        stored_moments = store.load(version, unique_dates[start_idx - 1:])
+
+    # Stage 1: BL estimators and volume metrics for every day in the window
+    payloads = build_payloads(days, df_summary, stored_moments, store, version, max_dte, bl_params,
+                              compact_bl, metrics)
+    return {
+        'payloads': payloads,
+        'df_summary': df_summary,
+        'relevant_dates': unique_dates[start_idx:],
+        'base_underlying': base_underlying,
+    }
+
+
+def sentiment_frame(window, daily_sentiment_scores):
+    """
+    Returns df_plot of a window from build_window: underlying price, daily and
+    cumulative returns, and daily and cumulative combined sentiment of its
+    relevant dates. `daily_sentiment_scores` maps quote dates to combined scores.
+    """
     # Build a DataFrame of daily underlying prices
-    df_price_only = (
-        df[['quote_date', 'underlying_last']]
-        .drop_duplicates(subset=['quote_date'])
-        .sort_values(by='quote_date')
-        .reset_index(drop=True)
-    )
-
-    # Compute daily & cumulative returns
+    df_price_only = window['df_summary'][['underlying_last']].reset_index()
+
+    # Compute daily & cumulative returns (cumulative from the first date in the table)
     df_price_only['daily_return'] = df_price_only['underlying_last'].pct_change()
-    df_price_only['cumulative_return'] = (1 + df_price_only['daily_return']).cumprod() - 1
+    df_price_only['cumulative_return'] = df_price_only['underlying_last'] / window['base_underlying'] - 1
 
     # Merge day-level combined sentiment
     df_price_only['daily_sentiment'] = df_price_only['quote_date'].map(daily_sentiment_scores).fillna(0.0)
     df_price_only['cumulative_sentiment'] = df_price_only['daily_sentiment'].cumsum()
 
     # Filter final results to the same last n days
-    relevant_dates = unique_dates[start_idx:]
-    df_plot = df_price_only[df_price_only['quote_date'].isin(relevant_dates)].copy()
+    return df_price_only[df_price_only['quote_date'].isin(window['relevant_dates'])].copy()
+
+
+def plot_results(df_plot, n_days, fig=None):
+    """
+    Draws the 2-axis chart of cumulative return vs. cumulative sentiment.
+    matplotlib is only imported here, so headless runs never load it.
+
+    Parameters:
+    - df_plot: DataFrame as returned by run_pipeline.
+    - n_days: int, number of days shown in the title.
+    - fig: Matplotlib Figure to draw on; a new pyplot figure if None.
+
+    Returns:
+    - fig: the Figure holding the plot.
+    """
+    if fig is None:
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=(10, 6))
 
     # Create 2-axis plot
-    fig, ax1 = plt.subplots(figsize=(10, 6))
+    ax1 = fig.subplots()
     ax2 = ax1.twinx()
 
     # Left axis: Cumulative Return
@@ -188,13 +493,449 @@ def run_pipeline(n_days=10, progress_callback=None):
     ax1.set_title(f"Last {n_days} Days: Cumulative Return vs. Combined Sentiment (with PCR)")
     ax1.grid(True)
 
-    # Return df_plot and the figure
+    return fig
+
+
+def run_pipeline(n_days=10, progress_callback=None, moment_db_path=DEFAULT_MOMENT_DB,
+                 db_path=DEFAULT_DB_PATH, max_dte=MAX_DTE, stream=False,
+                 columnar_dir=DEFAULT_COLUMNAR_DIR, concurrency=1, news_db_path=DEFAULT_NEWS_DB,
+                 workers=None, llm_batch_size=1, compact_bl=True, metrics=None, engine='spline',
+                 make_plot=True, ticker=DEFAULT_TICKER, table=DEFAULT_TABLE):
+    """
+    Runs the pipeline for the last `n_days` of data.
+
+    Parameters:
+    - n_days: int, number of quote dates scored (the day before them is loaded too).
+    - progress_callback: callable, receives the percentage of days scored.
+    - moment_db_path: str, SQLite store of BL moments reused across runs.
+    - db_path: str, SQLite database with the option quotes.
+    - max_dte: int, only expiries at most this many days out are used (None for all).
+    - stream: bool, read the quotes one day at a time.
+    - columnar_dir: str, columnar cache used instead of `db_path` when up to date (see columnar_store.py).
+    - concurrency: int, days (or LLM batches) scored at once.
+    - news_db_path: str, local news store (None fetches each day's news live).
+    - workers: int, processes backfilling the missing BL moments first (see backfill.py).
+    - llm_batch_size: int, days scored per LLM request.
+    - compact_bl: bool, send the BL estimators as a TSV table (see bl_payload.py) instead of a dict.
+    - metrics: PipelineMetrics, collects stage timings, cache hit rates and token usage.
+    - engine: str, 'spline' or 'grid' BL engine (see BL_dynamics.compute_chain_moments).
+    - make_plot: bool, draw the figure; False runs headless without importing matplotlib.
+    - ticker: str, ticker the news is fetched for.
+    - table: str, options table in `db_path`.
+
+    Returns:
+      - df_plot: A DataFrame containing the date, cumulative returns, and cumulative sentiment
+                 for the last n_days. attrs['metrics'] holds the run metrics.
+      - fig:     A Matplotlib Figure object with the 2-axis plot (None if make_plot is False).
+    """
+
+    metrics = metrics if metrics is not None else PipelineMetrics()
+    bl_params = dict(BL_PARAMS, engine=engine)
+
+    with metrics.stage('load_dates'):
+        columns, conn = open_source(db_path, columnar_dir, table)
+    try:
+        window = build_window(n_days, columns, conn, moment_db_path, db_path, max_dte, stream, columnar_dir,
+                              workers, compact_bl, metrics, bl_params, ticker, table)
+    finally:
+        if conn is not None:
+            conn.close()
+    if window is None:
+        return None, None
+
+    # We'll store a daily 'combined sentiment' (from BKM + news) in this dict
+    daily_sentiment_scores = {}
+
+    # Stage 2: news + LLM scoring, one progress step per finished day
+    def record(payload, scores):
+        daily_sentiment_scores[payload['quote_date']] = scores[1]
+
+    payloads = window['payloads']
+    score_payloads(payloads, progress_reporter(len(payloads), progress_callback, record), concurrency,
+                   llm_batch_size, news_db_path, metrics, ticker)
+
+    df_plot = sentiment_frame(window, daily_sentiment_scores)
+
+    fig = None
+    if make_plot:
+        with metrics.stage('plot'):
+            fig = plot_results(df_plot, n_days)
+
+    metrics.finish_run()
+    registry.merge(metrics)
+    df_plot.attrs['metrics'] = metrics.to_dict()
+
+    # Return df_plot and the figure (None in headless mode)
     return df_plot, fig
 
 
+def ticker_spec(ticker, db_path=DEFAULT_DB_PATH, table=DEFAULT_TABLE, columnar_dir=None):
+    """
+    Describes one underlying of a run_universe call: the ticker its news is
+    fetched for and the options `table` in `db_path`. The default data source
+    also uses the default columnar cache unless `columnar_dir` is given.
+    """
+    if columnar_dir is None and (db_path, table) == (DEFAULT_DB_PATH, DEFAULT_TABLE):
+        columnar_dir = DEFAULT_COLUMNAR_DIR
+    return {'ticker': ticker, 'db_path': db_path, 'table': table, 'columnar_dir': columnar_dir}
+
+
+async def score_universe_async(items, max_concurrency=8, llm_batch_size=1, news_db_path=DEFAULT_NEWS_DB,
+                               metrics=None):
+    """
+    Scores the payloads of several tickers as they arrive on the thread-safe
+    queue `items`, as (ticker, payloads, on_done) tuples followed by None.
+
+    All tickers share one budget of `max_concurrency` days (or batches of
+    `llm_batch_size` days) in flight and the pooled HTTP and OpenAI clients
+    of this event loop, so the LLM calls of one ticker run while the producer
+    builds the next one's payloads.
+    """
+    metrics = metrics or PipelineMetrics()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    limits = httpx.Limits(max_connections=max_concurrency)
+
+    async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT, limits=limits) as http, async_llm_client() as llm:
+        async def score_batch_async(batch, ticker, on_done, news_lookup):
+            async with semaphore:
+                scores = await asyncio.to_thread(score_batch, batch, ticker, news_lookup, metrics)
+            for payload, day_scores in zip(batch, scores):
+                on_done(payload, day_scores)
+
+        async def score_ticker(ticker, payloads, on_done):
+            # The bulk news download must not block the event loop
+            news_lookup = await asyncio.to_thread(news_lookup_for, payloads, ticker, news_db_path, metrics)
+            if llm_batch_size > 1:
+                await asyncio.gather(*(
+                    score_batch_async(payloads[i:i + llm_batch_size], ticker, on_done, news_lookup)
+                    for i in range(0, len(payloads), llm_batch_size)
+                ))
+            else:
+                await score_days_async(payloads, ticker, max_concurrency, on_done, news_lookup, metrics,
+                                       semaphore, http, llm)
+
+        # Token usage of every task started below is reported to `metrics`
+        with collecting(metrics):
+            tasks = []
+            while True:
+                item = await asyncio.to_thread(items.get)
+                if item is None:
+                    break
+                tasks.append(asyncio.create_task(score_ticker(*item)))
+            await asyncio.gather(*tasks)
+
+
+def run_universe(specs, n_days=10, progress_callback=None, moment_db_path=DEFAULT_MOMENT_DB, max_dte=MAX_DTE,
+                 stream=False, concurrency=1, news_db_path=DEFAULT_NEWS_DB, workers=None, llm_batch_size=1,
+                 compact_bl=True, metrics=None, engine='spline'):
+    """
+    Runs the pipeline for several underlyings in one job.
+
+    `specs` lists (ticker, db_path, table) tuples or ticker_spec keyword dicts.
+    Tickers are loaded and their BL payloads built one after the other in this
+    thread, while the news and LLM scoring of the tickers already built runs on
+    a background event loop (see score_universe_async). SQLite connections are
+    shared per database, and the BL, moment and LLM response caches, the HTTP
+    client and the `concurrency` budget of LLM requests in flight are shared by
+    all tickers. The other parameters are those of run_pipeline; no figures are
+    drawn.
+
+    Returns:
+    - results: dict {ticker: df_plot} in spec order, None for tickers without
+               enough quote dates. Every df_plot.attrs['metrics'] holds the
+               metrics of the whole run.
+    """
+    specs = [ticker_spec(**spec) if isinstance(spec, dict) else ticker_spec(*spec) for spec in specs]
+    tickers = [spec['ticker'] for spec in specs]
+    if len(set(tickers)) != len(tickers):
+        raise ValueError(f"Duplicate tickers in {tickers}")
+
+    metrics = metrics if metrics is not None else PipelineMetrics()
+    bl_params = dict(BL_PARAMS, engine=engine)
+    metrics.count('tickers', len(specs))
+
+    daily_sentiment_scores = {ticker: {} for ticker in tickers}
+
+    def recorder(ticker):
+        def on_done(payload, scores):
+            daily_sentiment_scores[ticker][payload['quote_date']] = scores[1]
+            reporter(payload, scores)
+        return on_done
+
+    windows = {}
+    items = queue.Queue()
+    connections = {}
+    llm_stats = response_cache.stats()
+    try:
+        # Dates are selected up front, so the progress total counts the days each ticker really has
+        sources = {}
+        with metrics.stage('load_dates'):
+            for spec in specs:
+                columns, conn = open_source(spec['db_path'], spec['columnar_dir'], spec['table'], connections)
+                sources[spec['ticker']] = (columns, conn, window_dates(n_days, columns, conn, spec['table']))
+        reporter = progress_reporter(sum(max(len(dates) - 1, 0) for _, _, dates in sources.values()),
+                                     progress_callback)
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='universe-scoring') as executor:
+            scoring = executor.submit(asyncio.run, score_universe_async(items, max(1, concurrency),
+                                                                        llm_batch_size, news_db_path, metrics))
+            try:
+                for spec in specs:
+                    ticker = spec['ticker']
+                    columns, conn, unique_dates = sources[ticker]
+                    window = build_window(n_days, columns, conn, moment_db_path, spec['db_path'], max_dte, stream,
+                                          spec['columnar_dir'], workers, compact_bl, metrics, bl_params, ticker,
+                                          spec['table'], unique_dates)
+                    windows[ticker] = window
+                    if window is not None and window['payloads']:
+                        for payload in window['payloads']:
+                            payload['ticker'] = ticker
+                        items.put((ticker, window['payloads'], recorder(ticker)))
+            finally:
+                items.put(None)
+            scoring.result()
+    finally:
+        for conn in connections.values():
+            conn.close()
+    llm_stats_after = response_cache.stats()
+    metrics.cache('llm_responses', llm_stats_after['hits'] - llm_stats['hits'],
+                  llm_stats_after['misses'] - llm_stats['misses'])
+
+    metrics.finish_run()
+    registry.merge(metrics)
+    snapshot = metrics.to_dict()
+    results = {}
+    for ticker in tickers:
+        window = windows.get(ticker)
+        results[ticker] = None if window is None else sentiment_frame(window, daily_sentiment_scores[ticker])
+        if results[ticker] is not None:
+            results[ticker].attrs['metrics'] = snapshot
+    return results
+
+
+def _number(value):
+    """
+    Returns a number as a float, or None if it is missing (NaN), for JSON / Arrow output.
+    """
+    return None if value is None or pd.isna(value) else float(value)
+
+
+def _expiry_moments(bl_estimators):
+    """
+    Day-t moments of a payload's BL estimators, one dict per expiry in expiry order.
+    """
+    rows = []
+    for key, estimators in sorted(bl_estimators.items()):
+        row = {'expire_date': key[:-len(ESTIMATOR_SUFFIX)]}
+        for side in SIDES:
+            for field in MOMENT_FIELDS:
+                row[f'{side}_{field}'] = _number(estimators[f'{side}_data_t'].get(field))
+        rows.append(row)
+    return rows
+
+
+def iter_pipeline(start=None, end=None, progress_callback=None, moment_db_path=DEFAULT_MOMENT_DB,
+                  db_path=DEFAULT_DB_PATH, max_dte=MAX_DTE, columnar_dir=DEFAULT_COLUMNAR_DIR, concurrency=1,
+                  news_db_path=DEFAULT_NEWS_DB, llm_batch_size=1, compact_bl=True, metrics=None, engine='spline',
+                  ticker=DEFAULT_TICKER, table=DEFAULT_TABLE, chunk_days=STREAM_CHUNK_DAYS, n_days=None):
+    """
+    Generator version of run_pipeline for long histories: yields one result row
+    per quote date from `start` to `end` (inclusive, None leaves that side open).
+    Without `start`, `n_days` limits the range to the last n_days quote dates
+    up to `end`.
+
+    The range is processed `chunk_days` quote dates at a time. Each chunk's
+    chains are streamed one day at a time from SQLite (or sliced from the
+    columnar cache), its payloads built and scored as in run_pipeline, and its
+    rows yielded before the next chunk is loaded, so memory use depends on
+    `chunk_days` rather than on the length of the range. Cumulative return is
+    measured from the first date in the table, as in run_pipeline; cumulative
+    sentiment from the start of the range. The other parameters are those of
+    run_pipeline.
+
+    Yields:
+    - row: dict with the result_stream.RESULT_COLUMNS, in date order. 'expiries'
+           lists the day's BL moments per expiry (result_stream.EXPIRY_FIELDS);
+           news_score and combined_score are None for days that were not scored.
+    """
+    metrics = metrics if metrics is not None else PipelineMetrics()
+    bl_params = dict(BL_PARAMS, engine=engine)
+    store = MomentStore(moment_db_path)
+    version = params_version(**bl_params, source=source_scope(db_path, table))
+
+    # Rows may be pulled from different threads (e.g. by a streaming response), one at a time
+    connections = {db_path: sqlite3.connect(db_path, check_same_thread=False)}
+    try:
+        with metrics.stage('load_dates'):
+            columns, conn = open_source(db_path, columnar_dir, table, connections)
+            all_dates = (columns.quote_dates_until(end) if columns is not None
+                         else quote_dates_until(conn, end, table))
+            base_underlying = columns.first_underlying() if columns is not None else first_underlying(conn, table)
+        # The first reported date needs the day before it as day t-1
+        if start is not None:
+            # Stored dates may be padded (OptionsDX); `start` is a plain ISO date
+            first = max(1, bisect.bisect_left([d.strip() for d in all_dates], start.strip()))
+        else:
+            first = max(1, len(all_dates) - n_days) if n_days is not None else 1
+
+        scores = {}
+
+        def record(payload, day_scores):
+            scores[payload['quote_date']] = day_scores
+
+        reporter = progress_reporter(max(0, len(all_dates) - first), progress_callback, record)
+        cumulative_sentiment = 0.0
+        for chunk_start in range(first, len(all_dates), chunk_days):
+            chunk = all_dates[chunk_start - 1:chunk_start + chunk_days]
+            with metrics.stage('load_chains'):
+                df_summary, days = load_days(chunk, columns, conn, max_dte, stream=True, table=table)
+            with metrics.stage('moment_store_load'):
+                stored_moments = store.load(version, chunk)
+            payloads = build_payloads(days, df_summary, stored_moments, store, version, max_dte, bl_params,
+                                      compact_bl, metrics)
+            score_payloads(payloads, reporter, concurrency, llm_batch_size, news_db_path, metrics, ticker)
+
+            expiries = {payload['quote_date']: _expiry_moments(payload['bl_estimators']) for payload in payloads}
+            prev_underlying = df_summary.at[chunk[0], 'underlying_last']
+            for quote_date in chunk[1:]:
+                underlying = df_summary.at[quote_date, 'underlying_last']
+                call_volume = df_summary.at[quote_date, 'c_volume']
+                put_volume = df_summary.at[quote_date, 'p_volume']
+                news_score, combined_score = scores.pop(quote_date, (None, None))
+                cumulative_sentiment += combined_score or 0.0
+                yield {
+                    'quote_date': str(quote_date),
+                    'underlying_last': _number(underlying),
+                    'daily_return': _number(underlying / prev_underlying - 1),
+                    'cumulative_return': _number(underlying / base_underlying - 1),
+                    'pcr': _number(put_volume / call_volume if call_volume != 0 else np.nan),
+                    'call_volume': _number(call_volume),
+                    'put_volume': _number(put_volume),
+                    'news_score': _number(news_score),
+                    'combined_score': _number(combined_score),
+                    'cumulative_sentiment': _number(cumulative_sentiment),
+                    'expiries': expiries.get(quote_date, []),
+                }
+                prev_underlying = underlying
+    finally:
+        connections[db_path].close()
+
+    metrics.finish_run()
+    registry.merge(metrics)
+
+
+def update_pipeline(sentiment_db_path=DEFAULT_SENTIMENT_DB, initial_days=10, progress_callback=None,
+                    moment_db_path=DEFAULT_MOMENT_DB, db_path=DEFAULT_DB_PATH, max_dte=MAX_DTE,
+                    columnar_dir=DEFAULT_COLUMNAR_DIR, concurrency=1, news_db_path=DEFAULT_NEWS_DB,
+                    llm_batch_size=1, compact_bl=True, metrics=None, engine='spline', ticker=DEFAULT_TICKER,
+                    table=DEFAULT_TABLE):
+    """
+    Incremental daily mode: scores only the quote dates that are newer than the
+    last day in the sentiment series stored in `sentiment_db_path` and appends them.
+
+    Only the last stored day (as day t-1) and the new days are loaded, so a
+    nightly run costs one day of BL work and LLM calls. Cumulative return and
+    cumulative sentiment continue from the last stored row's running totals.
+    On an empty store the last `initial_days` quote dates are scored, with the
+    cumulative return measured from the first date in the table, as in run_pipeline.
+    The store holds one series, so each ticker / table needs its own `sentiment_db_path`.
+    The remaining parameters are those of run_pipeline.
+
+    Returns:
+    - df_series: DataFrame of the whole stored series. attrs['new_dates'] lists
+                 the appended quote dates and attrs['metrics'] the run metrics.
+    """
+    metrics = metrics if metrics is not None else PipelineMetrics()
+    bl_params = dict(BL_PARAMS, engine=engine)
+    sentiment_store = SentimentStore(sentiment_db_path)
+    last = sentiment_store.last_row()
+
+    new_rows = []
+    conn = None
+    try:
+        with metrics.stage('load_dates'):
+            columns, conn = open_source(db_path, columnar_dir, table)
+            if last is None:
+                quote_dates = (columns.last_quote_dates(initial_days + 1) if columns is not None
+                               else last_quote_dates(conn, initial_days + 1, table))
+            else:
+                # The last scored day is day t-1 of the first new one
+                quote_dates = (columns.quote_dates_since(last['quote_date']) if columns is not None
+                               else quote_dates_since(conn, last['quote_date'], table))
+
+        if len(quote_dates) >= 2:
+            with metrics.stage('load_chains'):
+                df_summary, days = load_days(quote_dates, columns, conn, max_dte, table=table)
+                if last is None:
+                    base_underlying = columns.first_underlying() if columns is not None else first_underlying(conn, table)
+
+            store = MomentStore(moment_db_path)
+            version = params_version(**bl_params, source=source_scope(db_path, table))
+            with metrics.stage('moment_store_load'):
+                stored_moments = store.load(version, quote_dates)
+
+            payloads = build_payloads(days, df_summary, stored_moments, store, version, max_dte, bl_params,
+                                      compact_bl, metrics)
+
+            scores = {}
+
+            def record(payload, day_scores):
+                scores[payload['quote_date']] = day_scores
+
+            score_payloads(payloads, progress_reporter(len(payloads), progress_callback, record), concurrency,
+                           llm_batch_size, news_db_path, metrics, ticker)
+
+            # Running totals to continue from
+            if last is None:
+                prev_underlying = df_summary.at[quote_dates[0], 'underlying_last']
+                cumulative_return = prev_underlying / base_underlying - 1
+                cumulative_sentiment = 0.0
+            else:
+                prev_underlying = last['underlying_last']
+                cumulative_return = last['cumulative_return']
+                cumulative_sentiment = last['cumulative_sentiment']
+
+            # Every new date gets a row, so unscored days are not picked up again
+            for quote_date in quote_dates[1:]:
+                underlying = df_summary.at[quote_date, 'underlying_last']
+                daily_return = underlying / prev_underlying - 1
+                cumulative_return = (1 + cumulative_return) * (1 + daily_return) - 1
+                news_score, daily_sentiment = scores.get(quote_date, (None, 0.0))
+                cumulative_sentiment += daily_sentiment
+                call_volume = df_summary.at[quote_date, 'c_volume']
+                put_volume = df_summary.at[quote_date, 'p_volume']
+                new_rows.append({
+                    'quote_date': quote_date,
+                    'underlying_last': underlying,
+                    'daily_return': daily_return,
+                    'cumulative_return': cumulative_return,
+                    'news_score': news_score,
+                    'daily_sentiment': daily_sentiment,
+                    'cumulative_sentiment': cumulative_sentiment,
+                    'pcr': put_volume / call_volume if call_volume != 0 else np.nan,
+                    'call_volume': call_volume,
+                    'put_volume': put_volume,
+                })
+                prev_underlying = underlying
+            sentiment_store.append(new_rows)
+        else:
+            print("No new quote dates to score.")
+    finally:
+        if conn is not None:
+            conn.close()
+
+    metrics.finish_run()
+    registry.merge(metrics)
+    df_series = sentiment_store.load()
+    df_series.attrs['new_dates'] = [row['quote_date'] for row in new_rows]
+    df_series.attrs['metrics'] = metrics.to_dict()
+    return df_series
+
+
 '''if __name__ == "__main__":
     # If you run main.py directly, we just run the pipeline for last 10 days
     df_plot, fig = run_pipeline(n_days=10)
     if fig is not None:
+        import matplotlib.pyplot as plt
         plt.show()
 '''
\ No newline at end of file
@@ -0,0 +1,193 @@
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Collector and quote date of the code currently running. asyncio tasks inherit
+# them; work handed to a thread pool must be run in contextvars.copy_context()
+_current_metrics = contextvars.ContextVar('pipeline_metrics', default=None)
+_current_day = contextvars.ContextVar('pipeline_day', default=None)
+
+USAGE_FIELDS = ('prompt_tokens', 'completion_tokens', 'total_tokens')
+
+
+class PipelineMetrics:
+    """
+    Lightweight instrumentation of one or more pipeline runs.
+
+    Collects per-stage wall and CPU time (the CPU time of the running thread,
+    for stages that run on one thread) with call counts, plain counters, cache hit / miss counts, and OpenAI token
+    usage per model. Stages and token usage recorded with a quote date are
+    also broken down per day. All methods are thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.stages = defaultdict(lambda: {'wall': 0.0, 'cpu': 0.0, 'count': 0})
+        self.counters = defaultdict(int)
+        self.caches = defaultdict(lambda: {'hits': 0, 'misses': 0})
+        self.tokens = defaultdict(lambda: dict.fromkeys(USAGE_FIELDS + ('requests',), 0))
+        self.days = defaultdict(lambda: {'stages': defaultdict(float), 'tokens': 0})
+
+    @contextmanager
+    def stage(self, name, day=None, cpu=True):
+        """
+        Times the enclosed block as stage `name`, attributed to quote date `day`
+        if given. LLM token usage recorded inside the block goes to the same day.
+        Pass `cpu=False` for blocks that await inside an event loop: the loop
+        thread runs other tasks meanwhile, so its CPU time would count theirs;
+        only wall time is recorded then.
+        """
+        day_token = _current_day.set(day) if day is not None else None
+        wall, cpu_start = time.perf_counter(), time.thread_time() if cpu else None
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.thread_time() - cpu_start if cpu else 0.0
+            if day_token is not None:
+                _current_day.reset(day_token)
+            with self._lock:
+                entry = self.stages[name]
+                entry['wall'] += wall
+                entry['cpu'] += cpu
+                entry['count'] += 1
+                if day is not None:
+                    self.days[str(day)]['stages'][name] += wall
+
+    def finish_run(self):
+        with self._lock:
+            self.runs += 1
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def cache(self, name, hits, misses):
+        with self._lock:
+            self.caches[name]['hits'] += hits
+            self.caches[name]['misses'] += misses
+
+    def add_usage(self, model, usage, day=None):
+        """
+        Adds the `usage` field of an OpenAI response (None is ignored).
+        """
+        if usage is None:
+            return
+        with self._lock:
+            entry = self.tokens[model]
+            for field in USAGE_FIELDS:
+                entry[field] += getattr(usage, field, 0) or 0
+            entry['requests'] += 1
+            if day is not None:
+                self.days[str(day)]['tokens'] += getattr(usage, 'total_tokens', 0) or 0
+
+    def merge(self, other):
+        """
+        Adds another collector's totals to this one (per-day breakdowns are not kept).
+        """
+        snapshot = other.to_dict()
+        with self._lock:
+            self.runs += snapshot['runs']
+            for name, entry in snapshot['stages'].items():
+                for field in ('wall', 'cpu', 'count'):
+                    self.stages[name][field] += entry[field]
+            for name, value in snapshot['counters'].items():
+                self.counters[name] += value
+            for name, entry in snapshot['caches'].items():
+                self.caches[name]['hits'] += entry['hits']
+                self.caches[name]['misses'] += entry['misses']
+            for model, entry in snapshot['tokens'].items():
+                for field, value in entry.items():
+                    self.tokens[model][field] += value
+
+    def to_dict(self):
+        """
+        JSON-serializable snapshot; every cache also carries its hit rate.
+        """
+        with self._lock:
+            caches = {}
+            for name, entry in self.caches.items():
+                lookups = entry['hits'] + entry['misses']
+                caches[name] = dict(entry, hit_rate=entry['hits'] / lookups if lookups else 0.0)
+            return {
+                'runs': self.runs,
+                'stages': {name: dict(entry) for name, entry in self.stages.items()},
+                'counters': dict(self.counters),
+                'caches': caches,
+                'tokens': {model: dict(entry) for model, entry in self.tokens.items()},
+                'days': {day: {'stages': dict(entry['stages']), 'tokens': entry['tokens']}
+                         for day, entry in sorted(self.days.items())},
+            }
+
+
+# Totals over every run of this process, served by the /metrics endpoint
+registry = PipelineMetrics()
+
+
+@contextmanager
+def collecting(metrics):
+    """
+    Makes `metrics` the collector that record_usage reports to in this context.
+    """
+    token = _current_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_metrics.reset(token)
+
+
+def record_usage(model, usage):
+    """
+    Reports the token usage of one OpenAI response to the active collector, if any.
+    """
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.add_usage(model, usage, _current_day.get())
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus_text(metrics=registry):
+    """
+    Renders a collector in the Prometheus text exposition format.
+    """
+    snapshot = metrics.to_dict()
+    lines = [
+        '# HELP pipeline_runs_total Completed pipeline runs.',
+        '# TYPE pipeline_runs_total counter',
+        f"pipeline_runs_total {snapshot['runs']}",
+        '# HELP pipeline_stage_seconds_total Time spent per pipeline stage.',
+        '# TYPE pipeline_stage_seconds_total counter',
+    ]
+    for name, entry in sorted(snapshot['stages'].items()):
+        lines.append(f'pipeline_stage_seconds_total{{stage="{_label(name)}",clock="wall"}} {entry["wall"]:.6f}')
+        lines.append(f'pipeline_stage_seconds_total{{stage="{_label(name)}",clock="cpu"}} {entry["cpu"]:.6f}')
+    lines += ['# HELP pipeline_stage_calls_total Executions per pipeline stage.',
+              '# TYPE pipeline_stage_calls_total counter']
+    for name, entry in sorted(snapshot['stages'].items()):
+        lines.append(f'pipeline_stage_calls_total{{stage="{_label(name)}"}} {entry["count"]}')
+    lines += ['# HELP pipeline_events_total Pipeline event counters.',
+              '# TYPE pipeline_events_total counter']
+    for name, value in sorted(snapshot['counters'].items()):
+        lines.append(f'pipeline_events_total{{event="{_label(name)}"}} {value}')
+    lines += ['# HELP pipeline_cache_lookups_total Cache lookups by result.',
+              '# TYPE pipeline_cache_lookups_total counter']
+    for name, entry in sorted(snapshot['caches'].items()):
+        lines.append(f'pipeline_cache_lookups_total{{cache="{_label(name)}",result="hit"}} {entry["hits"]}')
+        lines.append(f'pipeline_cache_lookups_total{{cache="{_label(name)}",result="miss"}} {entry["misses"]}')
+    lines += ['# HELP pipeline_llm_tokens_total OpenAI token usage.',
+              '# TYPE pipeline_llm_tokens_total counter']
+    for model, entry in sorted(snapshot['tokens'].items()):
+        for field in USAGE_FIELDS:
+            kind = field[:-len('_tokens')]
+            lines.append(f'pipeline_llm_tokens_total{{model="{_label(model)}",kind="{kind}"}} {entry[field]}')
+    lines += ['# HELP pipeline_llm_requests_total OpenAI requests that reported usage.',
+              '# TYPE pipeline_llm_requests_total counter']
+    for model, entry in sorted(snapshot['tokens'].items()):
+        lines.append(f'pipeline_llm_requests_total{{model="{_label(model)}"}} {entry["requests"]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,141 @@
+import os
+import sqlite3
+
+from bl_config import DEFAULT_DB_PATH, DEFAULT_TABLE
+
+# Sidecar database next to /app/spx_data.db holding derived BL moments
+DEFAULT_MOMENT_DB = '/app/bl_moments.db'
+
+MOMENT_FIELDS = ('mean', 'std_dev', 'skewness', 'kurtosis')
+
+
+def params_version(risk_free_rate=0.01, smoothing_factor=0, spline_degree=3, days_per_year=252,
+                   engine='spline', grid_step=None, source=None, moment_method='exact'):
+    """
+    Returns the version string stored with every moment row. Rows computed with
+    different model parameters never mix, so changing a parameter simply
+    triggers a fresh backfill under a new version. `source` (see source_scope)
+    keeps the rows of further data sources apart from those of the default one (None).
+    `moment_method` only applies to the spline engine (see
+    BL_dynamics.compute_chain_moments); its default 'exact' adds nothing.
+    """
+    version = f"r={risk_free_rate}|s={smoothing_factor}|k={spline_degree}|dpy={days_per_year}"
+    if engine == 'spline':
+        # Rows of the default moment_method keep their original version string
+        if moment_method != 'exact':
+            version += f"|m={moment_method}"
+    else:
+        # 'grid=slice': each slice gets its own grid; earlier grid rows depended on their batch
+        version += f"|e={engine}|g={grid_step}|grid=slice"
+    if source is not None:
+        version += f"|src={source}"
+    return version
+
+
+def source_scope(db_path=DEFAULT_DB_PATH, table=DEFAULT_TABLE):
+    """
+    Returns the moment store scope of an options data source for params_version:
+    None for the default database and table, so their existing rows stay valid,
+    else 'db_path:table'. Moments depend only on the option quotes they were
+    computed from, so the scope follows the data source, not the news ticker.
+    """
+    db_path = os.path.abspath(db_path)
+    if db_path == os.path.abspath(DEFAULT_DB_PATH) and table == DEFAULT_TABLE:
+        return None
+    return f"{db_path}:{table}"
+
+
+class MomentStore:
+    """
+    Persistent SQLite store of per-(quote_date, expire_date, side) BL moments.
+
+    Historical option quotes never change, so once a slice has been computed
+    for a given parameter version it is read back instead of recomputed.
+    """
+
+    def __init__(self, db_path=DEFAULT_MOMENT_DB):
+        self.db_path = db_path
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS bl_moments (
+                    version     TEXT NOT NULL,
+                    quote_date  TEXT NOT NULL,
+                    expire_date TEXT NOT NULL,
+                    side        TEXT NOT NULL,
+                    mean        REAL,
+                    std_dev     REAL,
+                    skewness    REAL,
+                    kurtosis    REAL,
+                    PRIMARY KEY (version, quote_date, expire_date, side)
+                )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def load(self, version, quote_dates):
+        """
+        Bulk-reads every stored slice for the given quote dates.
+
+        Returns:
+        - stored: dict {quote_date: {expire_date: {'call': moments, 'put': moments}}}
+        """
+        quote_dates = [str(d) for d in quote_dates]
+        stored = {}
+        if not quote_dates:
+            return stored
+
+        placeholders = ','.join('?' * len(quote_dates))
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute(
+                f"SELECT quote_date, expire_date, side, {', '.join(MOMENT_FIELDS)} "
+                f"FROM bl_moments WHERE version = ? AND quote_date IN ({placeholders})",
+                [version] + quote_dates
+            ).fetchall()
+        finally:
+            conn.close()
+
+        for quote_date, expire_date, side, *values in rows:
+            # SQLite stores NaN as NULL
+            moments = {
+                name: float('nan') if value is None else value
+                for name, value in zip(MOMENT_FIELDS, values)
+            }
+            stored.setdefault(quote_date, {}).setdefault(expire_date, {})[side] = moments
+        return stored
+
+    def stored_dates(self, version):
+        """
+        Returns the set of quote dates with at least one stored slice for `version`.
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute("SELECT DISTINCT quote_date FROM bl_moments WHERE version = ?",
+                                (version,)).fetchall()
+        finally:
+            conn.close()
+        return {row[0] for row in rows}
+
+    def save(self, version, quote_date, chain_moments):
+        """
+        Writes the output of compute_chain_moments for one quote date.
+        """
+        rows = [
+            (version, str(quote_date), str(expire_date), side) + tuple(moments[name] for name in MOMENT_FIELDS)
+            for expire_date, sides in chain_moments.items()
+            for side, moments in sides.items()
+        ]
+        if not rows:
+            return
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO bl_moments VALUES ({','.join('?' * (4 + len(MOMENT_FIELDS)))})",
+                rows
+            )
+            conn.commit()
+        finally:
+            conn.close()
@@ -1,11 +1,115 @@
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
 from pydantic import BaseModel, ValidationError
-from openai import OpenAI
+
+from bl_payload import estimate_tokens
+from llm_cache import ResponseCache
+from metrics import record_usage
+
+
+
+# OpenAI clients, created on first use so importing this module stays cheap.
+# Assigning a client object here (e.g. an offline fake) replaces the real one.
+client = None
+
+# Async client override for the concurrent pipeline mode (e.g. an offline fake);
+# when None, each event loop opens its own client with async_llm_client
+async_client = None
+
+# Both calls run at temperature 0, so identical requests are served from disk;
+# the async functions do that SQLite I/O in a worker thread, off the event loop
+response_cache = ResponseCache()
+
+NEWS_MODEL = "gpt-4o-2024-08-06"
+ANALYSIS_MODEL = "gpt-4o-mini-2024-07-18"
+
+# Sizes of the prompts actually sent (cache hits excluded), most recent last
+prompt_sizes = deque(maxlen=1000)
+
+NEWS_SYSTEM_MESSAGE = "You are a financial sentiment analysis expert."
+ANALYSIS_SYSTEM_MESSAGE = "Final part of the five-part analysis."
+
+# Retries on rate limits, with exponential backoff plus jitter
+MAX_RATE_LIMIT_RETRIES = 5
+BACKOFF_BASE_SECONDS = 1.0
+
+
+def _report_prompt_size(model, messages):
+    chars = sum(len(message["content"]) for message in messages)
+    tokens = estimate_tokens("".join(message["content"] for message in messages))
+    prompt_sizes.append({"model": model, "chars": chars, "est_tokens": tokens})
+    print(f"Prompt for {model}: {chars} chars, ~{tokens} tokens")
+
+
+def _backoff_delay(attempt):
+    return BACKOFF_BASE_SECONDS * (2 ** attempt) * (1 + random.random())
+
+
+def _openai_client():
+    global client
+    if client is None:
+        from openai import OpenAI
+        client = OpenAI(
+            api_key='api_key')
+    return client
 
 
+@asynccontextmanager
+async def async_llm_client():
+    """
+    Yields an AsyncOpenAI client for the running event loop and closes it on exit.
+    Its connection pool is bound to that loop, so a client must not outlive it
+    or be shared with another loop. A client assigned to `async_client` is
+    yielded as is.
+    """
+    if async_client is not None:
+        yield async_client
+        return
+    from openai import AsyncOpenAI
+    async with AsyncOpenAI(api_key='api_key') as llm:
+        yield llm
 
-# Initialize OpenAI client
-client = OpenAI(
-    api_key='api_key')  
+
+async def _parse_async(llm, **kwargs):
+    """
+    Runs one structured-output request on `llm`, or on a client of its own if None.
+    """
+    if llm is None:
+        async with async_llm_client() as llm:
+            return await _parse_async(llm, **kwargs)
+    return await _with_backoff_async(llm.beta.chat.completions.parse, **kwargs)
+
+
+def _with_backoff(call, *args, **kwargs):
+    """
+    Runs `call`, retrying on RateLimitError with exponential backoff.
+    """
+    from openai import RateLimitError
+    for attempt in range(MAX_RATE_LIMIT_RETRIES):
+        try:
+            return call(*args, **kwargs)
+        except RateLimitError:
+            if attempt == MAX_RATE_LIMIT_RETRIES - 1:
+                raise
+            time.sleep(_backoff_delay(attempt))
+
+
+async def _with_backoff_async(call, *args, **kwargs):
+    """
+    Async counterpart of _with_backoff; sleeping does not block other days.
+    """
+    from openai import RateLimitError
+    for attempt in range(MAX_RATE_LIMIT_RETRIES):
+        try:
+            return await call(*args, **kwargs)
+        except RateLimitError:
+            if attempt == MAX_RATE_LIMIT_RETRIES - 1:
+                raise
+            await asyncio.sleep(_backoff_delay(attempt))
 
 # Define the Pydantic model for structured output
 class PolarityResponse(BaseModel):
@@ -14,11 +118,31 @@ class PolarityResponse(BaseModel):
     combined_score: float  # Результат, основанный на новостях и анализе BKM
 
 
+# Structured outputs of the batched requests: one entry per scored day
+class DayPolarity(PolarityResponse):
+    quote_date: str
 
-def get_score_from_news(text: dict, ticker: str):
-    prompt = (
-        f"You are a financial expert who reads public news and identifies whether the news is about the company '{ticker}'"
-        f"or not to predict the movement in stock prices for the '{ticker}’. You read the following news: {text}. Firstly, classify the news as related to the company "
+
+class BatchPolarityResponse(BaseModel):
+    days: list[DayPolarity]
+
+
+class DayNewsClassification(BaseModel):
+    quote_date: str
+    classification: str
+
+
+class BatchNewsResponse(BaseModel):
+    days: list[DayNewsClassification]
+
+
+
+def _news_instructions(ticker: str):
+    """
+    Classification steps of the news prompt, shared with the batched variant.
+    """
+    return (
+        "Firstly, classify the news as related to the company "
         f"'{ticker}' (1=yes, 0=no). Then classify the news as related to one  of the following categories:\n"
         "1. «Financial News» - news about earnings, stock performance, mergers\n"
         "2. «Product News» - news about launches, updates, innovations\n"
@@ -35,69 +159,159 @@ def get_score_from_news(text: dict, ticker: str):
         "And the last one is the overall classification whether the following news can cause the price movement at the market (1=yes, 0=no).\n"
         "Here is the example of the output: (1, «Financial News», 1, 1)"
     )
-    response = completion = client.beta.chat.completions.parse(
-        model="gpt-4o-2024-08-06",
-        messages=[
-            {"role": "system", "content": "You are a financial sentiment analysis expert."},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.0
+
+
+def build_news_prompt(text: dict, ticker: str):
+    return (
+        f"You are a financial expert who reads public news and identifies whether the news is about the company '{ticker}'"
+        f"or not to predict the movement in stock prices for the '{ticker}’. You read the following news: {text}. "
+        + _news_instructions(ticker)
     )
 
+
+def _news_messages(text: dict, ticker: str):
+    return [
+        {"role": "system", "content": NEWS_SYSTEM_MESSAGE},
+        {"role": "user", "content": build_news_prompt(text, ticker)},
+    ]
+
+
+def _stale_or_raise(key, error):
+    """
+    On an API error, falls back to an expired cache entry if one exists.
+    """
+    cached = response_cache.get(key, allow_stale=True)
+    if cached is None:
+        raise error
+    print(f"API error ({error}); using cached response instead.")
+    return cached
+
+
+def get_score_from_news(text: dict, ticker: str):
+    messages = _news_messages(text, ticker)
+    key = response_cache.make_key(NEWS_MODEL, messages)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+
+    _report_prompt_size(NEWS_MODEL, messages)
+    try:
+        completion = _with_backoff(
+            _openai_client().beta.chat.completions.parse,
+            model=NEWS_MODEL,
+            messages=messages,
+            temperature=0.0
+        )
+    except Exception as e:
+        return _stale_or_raise(key, e)
+
+    record_usage(NEWS_MODEL, getattr(completion, "usage", None))
     message = completion.choices[0].message.content
+    response_cache.put(key, message)
     return message
 
 
+async def get_score_from_news_async(text: dict, ticker: str, llm=None):
+    messages = _news_messages(text, ticker)
+    key = response_cache.make_key(NEWS_MODEL, messages)
+    cached = await asyncio.to_thread(response_cache.get, key)
+    if cached is not None:
+        return cached
 
-def analyze_news(bl_data, ticker, news_analysis, pcr_data, call_volume, put_volume):
-    prompt = (
+    _report_prompt_size(NEWS_MODEL, messages)
+    try:
+        completion = await _parse_async(
+            llm,
+            model=NEWS_MODEL,
+            messages=messages,
+            temperature=0.0
+        )
+    except Exception as e:
+        return await asyncio.to_thread(_stale_or_raise, key, e)
+
+    record_usage(NEWS_MODEL, getattr(completion, "usage", None))
+    message = completion.choices[0].message.content
+    await asyncio.to_thread(response_cache.put, key, message)
+    return message
+
+
+
+# How the BL data of a day is laid out: the compact TSV table of bl_payload.format_bl_table ...
+BL_TABLE_FORMAT = (
+    "The data for each day is a tab-separated table with one row per expiration date and option side. Its columns are:\n"
+    "- `expiry`: the expiration date; `side`: `call` or `put`, the options the moments were estimated from.\n"
+    "- `mean`, `std_dev`, `skewness`, `kurtosis`: the moments of the risk-neutral distribution on the day.\n"
+    "- `d_mean`, `d_std_dev`, `d_skewness`, `d_kurtosis`: the change of each moment from the previous trading day (today minus yesterday).\n"
+    "A `nan` cell marks a moment that could not be estimated, and a trailing note counts expiries left out of the table.\n"
+    "For each expiration date and side, the change of a parameter is its `d_` column (`d_std_dev`, `d_skewness`, `d_kurtosis`); judge its size against the parameter's level in the same row. Skip `nan` cells.\n"
+)
+
+# ... or, without compact_bl, the dict of the day's moments per expiry
+BL_DICT_FORMAT = (
+    "The data for each day is a dict with one entry per expiration date, keyed `<expiration_date>_bl_estimators`. "
+    "Each entry holds the moments (`mean`, `std_dev`, `skewness`, `kurtosis`) of the risk-neutral distribution "
+    "estimated from call and from put options, on the day (`call_data_t`, `put_data_t`) and on the previous trading day "
+    "(`call_data_t_minus_1`, `put_data_t_minus_1`).\n"
+    "For each expiration date and side, the change of a parameter is its value on the day minus its value on the previous day; "
+    "judge its size against the parameter's level on the day. Skip missing or `nan` values.\n"
+)
+
+# Scoring criteria shared by the single-day and the batched analysis prompts
+BL_SCORING_CRITERIA = (
+    "Your task is to score the day-over-day changes of the standard deviation, the skewness and the kurtosis, providing a metric-specific score for each parameter on a scale: [-1, -0.5, 0, 0.5, 1]. Use the following parameter-specific criteria:\n\n"
+
+    "1. **Take the daily difference** of each parameter as described above.\n\n"
+
+    "2. **Apply scoring criteria to each difference by parameter**:\n"
+    "   - For each parameter, map its change to a score based on parameter-specific trends:\n"
+    "     - **Standard deviation** (`std_dev`):\n"
+    "       - -1: Large decrease, indicating a notable reduction in volatility.\n"
+    "       - -0.5: Small decrease, implying a minor reduction in volatility.\n"
+    "       - 0: Little or no change in volatility.\n"
+    "       - 0.5: Small increase, suggesting a slight uptick in volatility.\n"
+    "       - 1: Large increase, indicating heightened volatility.\n"
+    "     - **Skewness** (`skewness`):\n"
+    "       - -1: Large decrease, reflecting a strong shift towards negative skew (left-tail risk).\n"
+    "       - -0.5: Small decrease, suggesting a minor shift towards negative skew.\n"
+    "       - 0: No significant change, skew remains stable.\n"
+    "       - 0.5: Small increase, suggesting a minor shift towards positive skew (right-tail risk).\n"
+    "       - 1: Large increase, indicating a strong shift towards positive skew.\n"
+    "     - **Kurtosis** (`kurtosis`):\n"
+    "       - -1: Large decrease, indicating a drop in tail risk or fewer extreme values.\n"
+    "       - -0.5: Small decrease, suggesting a minor decrease in tail risk.\n"
+    "       - 0: No significant change, distribution remains stable in terms of tails.\n"
+    "       - 0.5: Small increase, indicating slightly more tail risk or extreme events.\n"
+    "       - 1: Large increase, suggesting a sharp increase in tail risk or extreme values.\n"
+    "     - For each parameter, use `threshold_high` and `threshold_low` values specific to historical norms or expected ranges to determine whether changes are 'large' or 'small'.\n\n"
+
+    "3. **Weight the scores based on expiration dates**:\n"
+    "   - Closer expiration dates should be weighted higher in the final analysis, as they are more immediate. Factor this weighting into your final summary or aggregate score for each parameter.\n\n"
+
+    "4. **Interpret the scores**:\n"
+    "   - High absolute scores (like -1 or 1) indicate strong trends or notable shifts in that parameter.\n"
+    "   - Scores closer to zero imply stability or minimal change.\n\n"
+
+    "5. **Output the results**:\n"
+    "   - For each expiration date, side and parameter, provide the calculated score and a brief explanation describing the trend (stable, increasing, or decreasing) specific to that parameter.\n"
+    "   - Summarize the overall trend by aggregating or averaging the scores, prioritizing closer expiration dates in the final interpretation.\n\n"
+
+    "PLEASE\n\n"
+)
+
+
+def bl_scoring_instructions(bl_data):
+    """
+    Layout description matching `bl_data` (a TSV table string or the estimators dict), then the scoring criteria.
+    """
+    return (BL_TABLE_FORMAT if isinstance(bl_data, str) else BL_DICT_FORMAT) + BL_SCORING_CRITERIA
+
+
+def build_analysis_prompt(bl_data, ticker, news_analysis, pcr_data, call_volume, put_volume):
+    return (
         f"Hello, can you please\n"
-        f"Analyze the Breeden-Litzenberger estimators (variance, skewness, and kurtosis) by comparing today’s values with those from yesterday.\n"
-        f"Data for Breeden-Litzenberger estimators: {bl_data}.\n"
-        f"The data for each day is organized by expiration date, structured as follows for both `data_today` and `data_yesterday`:\n"
-        f"data_today = {{expiration_date_1: {{'variance': variance_today_1, 'skewness': skewness_today_1, 'kurtosis': kurtosis_today_1}},\n"
-        f"expiration_date_2: {{...}}, ...}}\n"
-        f"data_yesterday = {{expiration_date_1: {{'variance': variance_yesterday_1, 'skewness': skewness_yesterday_1, 'kurtosis': kurtosis_yesterday_1}},\n"
-        f"expiration_date_2: {{...}}, ...}}\n"
-        f"Your task is to analyze the differences for each parameter (variance, skewness, kurtosis) between today and yesterday, providing a metric-specific score for each parameter on a scale: [-1, -0.5, 0, 0.5, 1]. Use the following parameter-specific criteria:\n\n"
-
-        f"1. **Calculate the daily difference**:\n"
-        f"   - For each expiration date and parameter, subtract yesterday’s value from today’s, i.e., delta = today_value - yesterday_value.\n\n"
-
-        f"2. **Apply scoring criteria to each difference by parameter**:\n"
-        f"   - For each parameter, map `delta` to a score based on parameter-specific trends:\n"
-        f"     - **Variance**:\n"
-        f"       - -1: Large decrease, indicating a notable reduction in volatility.\n"
-        f"       - -0.5: Small decrease, implying a minor reduction in volatility.\n"
-        f"       - 0: Little or no change in volatility.\n"
-        f"       - 0.5: Small increase, suggesting a slight uptick in volatility.\n"
-        f"       - 1: Large increase, indicating heightened volatility.\n"
-        f"     - **Skewness**:\n"
-        f"       - -1: Large decrease, reflecting a strong shift towards negative skew (left-tail risk).\n"
-        f"       - -0.5: Small decrease, suggesting a minor shift towards negative skew.\n"
-        f"       - 0: No significant change, skew remains stable.\n"
-        f"       - 0.5: Small increase, suggesting a minor shift towards positive skew (right-tail risk).\n"
-        f"       - 1: Large increase, indicating a strong shift towards positive skew.\n"
-        f"     - **Kurtosis**:\n"
-        f"       - -1: Large decrease, indicating a drop in tail risk or fewer extreme values.\n"
-        f"       - -0.5: Small decrease, suggesting a minor decrease in tail risk.\n"
-        f"       - 0: No significant change, distribution remains stable in terms of tails.\n"
-        f"       - 0.5: Small increase, indicating slightly more tail risk or extreme events.\n"
-        f"       - 1: Large increase, suggesting a sharp increase in tail risk or extreme values.\n"
-        f"     - For each parameter, use `threshold_high` and `threshold_low` values specific to historical norms or expected ranges to determine whether changes are 'large' or 'small'.\n\n"
-
-        f"3. **Weight the scores based on expiration dates**:\n"
-        f"   - Closer expiration dates should be weighted higher in the final analysis, as they are more immediate. Factor this weighting into your final summary or aggregate score for each parameter.\n\n"
-
-        f"4. **Interpret the scores**:\n"
-        f"   - High absolute scores (like -1 or 1) indicate strong trends or notable shifts in that parameter.\n"
-        f"   - Scores closer to zero imply stability or minimal change.\n\n"
-
-        f"5. **Output the results**:\n"
-        f"   - For each expiration date and parameter, provide the calculated score and a brief explanation describing the trend (stable, increasing, or decreasing) specific to that parameter.\n"
-        f"   - Summarize the overall trend by aggregating or averaging the scores, prioritizing closer expiration dates in the final interpretation.\n\n"
-
-        f"PLEASE\n\n"
+        f"Analyze the Breeden-Litzenberger estimators (standard deviation, skewness, and kurtosis) by scoring their changes from yesterday.\n"
+        f"Data for Breeden-Litzenberger estimators:\n{bl_data}\n"
+        f"{bl_scoring_instructions(bl_data)}"
     
         f"Also Incorporate the following additional option market data into analysis of bkm_estimators. "
         f"- Put-Call Ratio (PCR): {pcr_data}.\n"
@@ -110,26 +324,250 @@ def analyze_news(bl_data, ticker, news_analysis, pcr_data, call_volume, put_volu
         f"Return the result as scores in format (news_score, estimators_score).\n"
     )
 
+
+def _analysis_messages(bl_data, ticker, news_analysis, pcr_data, call_volume, put_volume):
+    return [
+        {"role": "system", "content": ANALYSIS_SYSTEM_MESSAGE},
+        {"role": "user", "content": build_analysis_prompt(bl_data, ticker, news_analysis, pcr_data,
+                                                          call_volume, put_volume)}
+    ]
+
+
+def _parse_polarity(completion, key):
+    record_usage(ANALYSIS_MODEL, getattr(completion, "usage", None))
+    message = completion.choices[0].message
+    if message.parsed is None:
+        return (0.0, 0.0)
+
+    scores = (float(message.parsed.news_analysis_score), float(message.parsed.combined_score))
+    response_cache.put(key, scores)
+    return scores
+
+
+def _polarity_fallback(key):
+    """
+    Cached scores for a failed request, or the (0.0, 0.0) placeholder.
+    """
+    cached = response_cache.get(key, allow_stale=True)
+    if cached is None:
+        return (0.0, 0.0)
+    print("Using cached polarity scores instead.")
+    return tuple(cached)
+
+
+def analyze_news(bl_data, ticker, news_analysis, pcr_data, call_volume, put_volume):
+    messages = _analysis_messages(bl_data, ticker, news_analysis, pcr_data, call_volume, put_volume)
+    key = response_cache.make_key(ANALYSIS_MODEL, messages, PolarityResponse)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return tuple(cached)
+
+    _report_prompt_size(ANALYSIS_MODEL, messages)
     try:
-        completion = client.beta.chat.completions.parse(
-            model="gpt-4o-mini-2024-07-18",
-            messages=[
-                {"role": "system", "content": "Final part of the five-part analysis."},
-                {"role": "user", "content": prompt}
-            ],
+        completion = _with_backoff(
+            _openai_client().beta.chat.completions.parse,
+            model=ANALYSIS_MODEL,
+            messages=messages,
             response_format=PolarityResponse,
             temperature=0.0
         )
 
-        message = completion.choices[0].message
-        news_analysis_score = message.parsed.news_analysis_score if message.parsed else 0.0
-        combined_score = message.parsed.combined_score if message.parsed else 0.0
+        return _parse_polarity(completion, key)
+
+    except ValidationError as e:
+        print(f"Validation error with structured response: {e}")
+        return _polarity_fallback(key)
+    except Exception as e:
+        print(f"An error occurred while fetching polarity: {e}")
+        return _polarity_fallback(key)
+
+
+async def analyze_news_async(bl_data, ticker, news_analysis, pcr_data, call_volume, put_volume, llm=None):
+    messages = _analysis_messages(bl_data, ticker, news_analysis, pcr_data, call_volume, put_volume)
+    key = response_cache.make_key(ANALYSIS_MODEL, messages, PolarityResponse)
+    cached = await asyncio.to_thread(response_cache.get, key)
+    if cached is not None:
+        return tuple(cached)
 
-        return (float(news_analysis_score), float(combined_score))
+    _report_prompt_size(ANALYSIS_MODEL, messages)
+    try:
+        completion = await _parse_async(
+            llm,
+            model=ANALYSIS_MODEL,
+            messages=messages,
+            response_format=PolarityResponse,
+            temperature=0.0
+        )
+
+        return await asyncio.to_thread(_parse_polarity, completion, key)
 
     except ValidationError as e:
         print(f"Validation error with structured response: {e}")
-        return (0.0, 0.0)
+        return await asyncio.to_thread(_polarity_fallback, key)
     except Exception as e:
         print(f"An error occurred while fetching polarity: {e}")
-        return (0.0, 0.0)
\ No newline at end of file
+        return await asyncio.to_thread(_polarity_fallback, key)
+
+
+def _date_key(quote_date):
+    """Normalized form of a quote date, used both in batch prompts and to match the dates the model returns."""
+    return str(quote_date).strip()
+
+
+# Batched scoring: K days per request instead of one. The instructions go first,
+# in the system message, and are identical for every batch of a ticker, so the
+# provider's prompt-prefix cache serves them; only the per-day data in the user
+# message changes between requests.
+
+def _news_batch_messages(news_by_date: dict, ticker: str):
+    instructions = (
+        f"{NEWS_SYSTEM_MESSAGE}\n"
+        f"You are a financial expert who reads public news and identifies whether the news is about the company '{ticker}' "
+        f"or not to predict the movement in stock prices for the '{ticker}'. You will receive the news of several days, "
+        f"each under its date. For the news of each day separately: {_news_instructions(ticker)}\n"
+        "Return one entry per day, with the day's date in `quote_date` and its output in `classification`."
+    )
+    days = "\n\n".join(f"Date {_date_key(quote_date)}:\n{text}" for quote_date, text in news_by_date.items())
+    return [
+        {"role": "system", "content": instructions},
+        {"role": "user", "content": days},
+    ]
+
+
+def _analysis_batch_day(day: dict, ticker: str):
+    return (
+        f"Date {_date_key(day['quote_date'])}:\n"
+        f"Data for Breeden-Litzenberger estimators:\n{day['bl_data']}\n"
+        f"- Put-Call Ratio (PCR): {day['pcr_data']}.\n"
+        f"- Call Option Volume: {day['call_volume']}.\n"
+        f"- Put Option Volume: {day['put_volume']}.\n"
+        f"News for {ticker}:\n{day['news_analysis']}\n"
+    )
+
+
+def _analysis_batch_messages(days: list, ticker: str):
+    instructions = (
+        f"{ANALYSIS_SYSTEM_MESSAGE}\n"
+        f"You will receive the data of several days, each under its date. For each day separately, "
+        f"analyze the Breeden-Litzenberger estimators (standard deviation, skewness, and kurtosis) by scoring their changes from yesterday.\n"
+        f"{bl_scoring_instructions(days[0]['bl_data'] if days else '')}"
+        f"Also incorporate the day's Put-Call Ratio (PCR) and call and put option volumes into the analysis of the estimators.\n"
+        f"Then take into account only the news of that day which really can influence the price movements and correspond to {ticker}, "
+        f"and give a news score from range (-1, 0, 1): 1 if the news can positively influence the price movement, -1 if it can negatively affect it "
+        f"and 0 if the news are neutral.\n"
+        f"Conclude with an overall sentiment based on the estimators, the volumes and the news analysis.\n"
+        f"Return one entry per day, with the day's date in `quote_date`, the news score in `news_analysis_score` "
+        f"and the overall score in `combined_score`.\n"
+    )
+    return [
+        {"role": "system", "content": instructions},
+        {"role": "user", "content": "\n".join(_analysis_batch_day(day, ticker) for day in days)},
+    ]
+
+
+def _batch_request(model, messages, response_format, dates, extract):
+    """
+    Sends one batched request and maps its validated entries back to `dates`.
+
+    Parameters:
+    - model: str, model name.
+    - messages: list of chat messages.
+    - response_format: batch Pydantic model with a `days` list.
+    - dates: list of quote dates the request covers.
+    - extract: callable turning one entry into the per-day value.
+
+    Returns:
+    - results: dict {quote_date: value} for the dates the response covered,
+      keyed by the original `dates`. Dates are matched on their _date_key form;
+      entries for unknown or repeated dates are dropped; only a response that
+      covers every date is cached.
+    """
+    wanted = {_date_key(quote_date): quote_date for quote_date in dates}
+    key = response_cache.make_key(model, messages, response_format)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return {wanted[date]: value for date, value in cached.items() if date in wanted}
+
+    _report_prompt_size(model, messages)
+    try:
+        completion = _with_backoff(
+            _openai_client().beta.chat.completions.parse,
+            model=model,
+            messages=messages,
+            response_format=response_format,
+            temperature=0.0
+        )
+        record_usage(model, getattr(completion, "usage", None))
+        parsed = completion.choices[0].message.parsed
+    except Exception as e:
+        print(f"Batch request for {len(dates)} days failed ({e}).")
+        stale = response_cache.get(key, allow_stale=True) or {}
+        return {wanted[date]: value for date, value in stale.items() if date in wanted}
+
+    if parsed is None:
+        return {}
+
+    results = {}
+    for entry in parsed.days:
+        quote_date = _date_key(entry.quote_date)
+        if quote_date in wanted and quote_date not in results:
+            results[quote_date] = extract(entry)
+
+    if len(results) == len(wanted):
+        response_cache.put(key, results)
+    return {wanted[date]: value for date, value in results.items()}
+
+
+def get_score_from_news_batch(news_by_date: dict, ticker: str):
+    """
+    Classifies the news of several days in one request.
+
+    Parameters:
+    - news_by_date: dict {quote_date: news dict}.
+    - ticker: str.
+
+    Returns:
+    - dict {quote_date: classification}. Days missing from the batch response
+      are classified with single-day get_score_from_news calls.
+    """
+    news_by_date = {str(quote_date): text for quote_date, text in news_by_date.items()}
+    results = _batch_request(NEWS_MODEL, _news_batch_messages(news_by_date, ticker), BatchNewsResponse,
+                             list(news_by_date), lambda entry: entry.classification)
+
+    for quote_date, text in news_by_date.items():
+        if quote_date not in results:
+            results[quote_date] = get_score_from_news(text, ticker)
+    return results
+
+
+def analyze_news_batch(days: list, ticker: str):
+    """
+    Scores several days in one structured-output request.
+
+    Parameters:
+    - days: list of dicts with the analyze_news arguments of each day
+            (quote_date, bl_data, news_analysis, pcr_data, call_volume, put_volume).
+    - ticker: str.
+
+    Returns:
+    - dict {quote_date: (news_score, combined_score)}. Days missing from the
+      batch response, or all of them if the request fails, are scored with
+      single-day analyze_news calls.
+    """
+    days = [dict(day, quote_date=str(day['quote_date'])) for day in days]
+    results = _batch_request(ANALYSIS_MODEL, _analysis_batch_messages(days, ticker), BatchPolarityResponse,
+                             [day['quote_date'] for day in days],
+                             lambda entry: (float(entry.news_analysis_score), float(entry.combined_score)))
+    results = {quote_date: tuple(scores) for quote_date, scores in results.items()}
+
+    for day in days:
+        if day['quote_date'] not in results:
+            results[day['quote_date']] = analyze_news(
+                day['bl_data'],
+                ticker=ticker,
+                news_analysis=day['news_analysis'],
+                pcr_data=day['pcr_data'],
+                call_volume=day['call_volume'],
+                put_volume=day['put_volume']
+            )
+    return results
@@ -1,5 +1,71 @@
 from datetime import datetime, timedelta
 import requests
+import httpx
+
+API_KEY = 'api_key'
+REQUEST_TIMEOUT = 10
+
+# Pooled session: consecutive days reuse the same TLS connection to the API
+_session = requests.Session()
+
+
+def _news_url(date_str: str, ticker: str) -> str:
+    """
+    Builds the stocknewsapi.com URL for the two-day window ending on `date_str`.
+    Raises ValueError if the date cannot be parsed.
+    """
+    # Parse and format dates
+    date_obj = datetime.strptime(date_str.strip(), '%Y-%m-%d')
+    today = date_obj.strftime("%m%d%Y")
+    yesterday = (date_obj - timedelta(days=1)).strftime("%m%d%Y")
+
+    return (
+        f'https://stocknewsapi.com/api/v1?tickers={ticker}'
+        f'&items=100&date={yesterday}-{today}&page=1&token={API_KEY}'
+    )
+
+
+def fetch_news_page(ticker: str, start_date, end_date, page: int = 1) -> dict:
+    """
+    Fetches one page of news for `ticker` published between `start_date` and
+    `end_date` (datetime.date, inclusive) and returns the raw JSON payload,
+    which carries 'data' and 'total_pages'. Network errors are raised.
+    This is the default fetcher of news_store.NewsStore.
+    """
+    url = (
+        f'https://stocknewsapi.com/api/v1?tickers={ticker}&items=100'
+        f'&date={start_date.strftime("%m%d%Y")}-{end_date.strftime("%m%d%Y")}'
+        f'&page={page}&token={API_KEY}'
+    )
+    response = _session.get(url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def _parse_news(data) -> dict:
+    """
+    Turns the API JSON payload into {title: text}, or {} if it is malformed.
+    """
+    # Validate the JSON structure
+    if 'data' not in data:
+        print(f"Warning: 'data' key not found in response. Returning empty dict.")
+        return {}
+
+    # Expecting 'data' to be a list of news items
+    if not isinstance(data['data'], list):
+        print(f"Warning: 'data' field in response is not a list. Returning empty dict.")
+        return {}
+
+    # Build the result dictionary
+    news_list = data['data']
+    news = {}
+    for item in news_list:
+        title = item.get('title')
+        text = item.get('text')
+        if title and text:
+            news[title] = text
+
+    return news
 
 
 def get_news(date_str: str, ticker: str = 'SPY') -> dict:
@@ -14,46 +80,16 @@ def get_news(date_str: str, ticker: str = 'SPY') -> dict:
     :param ticker: Stock ticker, default 'SPY'.
     :return: Dictionary {title: text} of news articles, or {} on error.
     """
-    API_KEY = 'api_key'
     try:
-        # Parse and format dates
-        date_obj = datetime.strptime(date_str.strip(), '%Y-%m-%d')
-        today = date_obj.strftime("%m%d%Y")
-        yesterday = (date_obj - timedelta(days=1)).strftime("%m%d%Y")
-
-        url = (
-            f'https://stocknewsapi.com/api/v1?tickers={ticker}'
-            f'&items=100&date={yesterday}-{today}&page=1&token={API_KEY}'
-        )
+        url = _news_url(date_str, ticker)
 
         # Make the API request
-        response = requests.get(url, timeout=10)
+        response = _session.get(url, timeout=REQUEST_TIMEOUT)
         # Raise an HTTPError if the response was unsuccessful (4xx/5xx)
         response.raise_for_status()
 
         # Parse JSON
-        data = response.json()
-
-        # Validate the JSON structure
-        if 'data' not in data:
-            print(f"Warning: 'data' key not found in response. Returning empty dict.")
-            return {}
-
-        # Expecting 'data' to be a list of news items
-        if not isinstance(data['data'], list):
-            print(f"Warning: 'data' field in response is not a list. Returning empty dict.")
-            return {}
-
-        # Build the result dictionary
-        news_list = data['data']
-        news = {}
-        for item in news_list:
-            title = item.get('title')
-            text = item.get('text')
-            if title and text:
-                news[title] = text
-
-        return news
+        return _parse_news(response.json())
 
     except ValueError as ve:
         # Catches date parsing errors or JSON decode errors
@@ -66,4 +102,32 @@ def get_news(date_str: str, ticker: str = 'SPY') -> dict:
         print(f"An unexpected error occurred while fetching news: {e}")
 
     # Return empty dict if any exception was raised
+    return {}
+
+
+async def get_news_async(date_str: str, ticker: str = 'SPY', client: httpx.AsyncClient = None) -> dict:
+    """
+    Async counterpart of get_news for the concurrent pipeline mode.
+    Pass a shared httpx.AsyncClient to pool connections across days;
+    errors are handled the same way and yield an empty dictionary.
+    """
+    try:
+        url = _news_url(date_str, ticker)
+
+        if client is None:
+            async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as own_client:
+                response = await own_client.get(url)
+        else:
+            response = await client.get(url, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+
+        return _parse_news(response.json())
+
+    except ValueError as ve:
+        print(f"ValueError encountered (date parsing or JSON issue): {ve}")
+    except httpx.HTTPError as he:
+        print(f"Network error occurred while fetching news: {he}")
+    except Exception as e:
+        print(f"An unexpected error occurred while fetching news: {e}")
+
     return {}
\ No newline at end of file
@@ -0,0 +1,201 @@
+import json
+import sqlite3
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+from news_api_wrapper import fetch_news_page
+
+DEFAULT_NEWS_DB = '/app/news_store.db'
+
+# Same cap as the per-day API request (items=100, page=1)
+ITEMS_PER_LOOKUP = 100
+
+
+def _to_date(value):
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip(), '%Y-%m-%d').date()
+
+
+def _parse_published(value):
+    """
+    Parses the API's RFC 2822 timestamp ("Fri, 13 Oct 2023 16:45:00 -0400").
+    Returns (UTC ISO timestamp for ordering, local publish date).
+    """
+    published = parsedate_to_datetime(value)
+    return published.astimezone(timezone.utc).isoformat(), published.date().isoformat()
+
+
+def file_fetcher(path, page_size=None):
+    """
+    Returns a fetcher that serves news from a JSON fixture instead of the API.
+    The file holds either a list of news items or an API-style {'data': [...]}.
+    With `page_size` the matching items are split into pages like the API's.
+    Items whose date cannot be parsed are passed through, as the API may send them.
+    """
+    with open(path) as f:
+        payload = json.load(f)
+    items = payload['data'] if isinstance(payload, dict) else payload
+
+    def in_range(item, start_date, end_date):
+        try:
+            return start_date <= parsedate_to_datetime(item.get('date')).date() <= end_date
+        except (TypeError, ValueError):
+            return True
+
+    def fetch(ticker, start_date, end_date, page=1):
+        selected = [item for item in items if in_range(item, start_date, end_date)]
+        if page_size is None:
+            return {'data': selected if page == 1 else [], 'total_pages': 1}
+        total_pages = max(1, -(-len(selected) // page_size))
+        return {'data': selected[(page - 1) * page_size:page * page_size], 'total_pages': total_pages}
+
+    return fetch
+
+
+class NewsStore:
+    """
+    Local SQLite store of news items keyed by ticker and publish date.
+
+    Missing date ranges are filled by one bulk fetch that follows pagination;
+    per-day lookups are then answered from disk. `fetcher(ticker, start_date,
+    end_date, page)` returns an API-style payload and can be swapped for a
+    fixture (see file_fetcher) in tests.
+    """
+
+    def __init__(self, db_path=DEFAULT_NEWS_DB, fetcher=fetch_news_page):
+        self.db_path = db_path
+        self.fetcher = fetcher
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS news (
+                    ticker       TEXT NOT NULL,
+                    publish_date TEXT NOT NULL,
+                    published_at TEXT NOT NULL,
+                    title        TEXT NOT NULL,
+                    text         TEXT NOT NULL,
+                    PRIMARY KEY (ticker, published_at, title)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_news_ticker_date ON news (ticker, publish_date)")
+            # Days whose news has been fully downloaded, including days without any news
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS news_coverage (
+                    ticker TEXT NOT NULL,
+                    day    TEXT NOT NULL,
+                    PRIMARY KEY (ticker, day)
+                )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _missing_ranges(self, conn, ticker, start_date, end_date):
+        """
+        Returns the uncovered days between start_date and end_date as contiguous (start, end) ranges.
+        """
+        covered = {
+            row[0] for row in conn.execute(
+                "SELECT day FROM news_coverage WHERE ticker = ? AND day BETWEEN ? AND ?",
+                (ticker, start_date.isoformat(), end_date.isoformat())
+            )
+        }
+        ranges = []
+        day = start_date
+        while day <= end_date:
+            if day.isoformat() not in covered:
+                if ranges and ranges[-1][1] == day - timedelta(days=1):
+                    ranges[-1][1] = day
+                else:
+                    ranges.append([day, day])
+            day += timedelta(days=1)
+        return [tuple(r) for r in ranges]
+
+    def _fetch_range(self, ticker, start_date, end_date):
+        rows = []
+        page, total_pages = 1, 1
+        while page <= total_pages:
+            data = self.fetcher(ticker, start_date, end_date, page)
+            items = data.get('data')
+            if not isinstance(items, list):
+                print(f"Warning: 'data' field missing or not a list on page {page}.")
+                break
+            for item in items:
+                title, text, published = item.get('title'), item.get('text'), item.get('date')
+                if not (title and text and published):
+                    continue
+                try:
+                    published_at, publish_date = _parse_published(published)
+                except (TypeError, ValueError):
+                    # One malformed item must not leave the whole range uncovered
+                    print(f"Warning: skipping news item with unparseable date {published!r}: {title}")
+                    continue
+                rows.append((ticker, publish_date, published_at, title, text))
+            total_pages = int(data.get('total_pages') or 1)
+            page += 1
+        return rows
+
+    def ensure_range(self, ticker, start_date, end_date):
+        """
+        Downloads news for every day between start_date and end_date that is not
+        stored yet. Days from today on are never marked as covered, since more
+        news can still arrive. Network errors are reported and leave the range
+        uncovered, so the next call retries it.
+        """
+        start_date, end_date = _to_date(start_date), _to_date(end_date)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for range_start, range_end in self._missing_ranges(conn, ticker, start_date, end_date):
+                try:
+                    rows = self._fetch_range(ticker, range_start, range_end)
+                except Exception as e:
+                    print(f"Error fetching news for {ticker} {range_start}..{range_end}: {e}")
+                    continue
+
+                conn.executemany("INSERT OR IGNORE INTO news VALUES (?, ?, ?, ?, ?)", rows)
+                today = date.today()
+                day = range_start
+                while day <= range_end and day < today:
+                    conn.execute("INSERT OR IGNORE INTO news_coverage VALUES (?, ?)", (ticker, day.isoformat()))
+                    day += timedelta(days=1)
+                conn.commit()
+        finally:
+            conn.close()
+
+    def prefetch(self, ticker, quote_dates):
+        """
+        Covers the two-day lookup window of every date in `quote_dates` with a
+        single ensure_range call.
+        """
+        days = [_to_date(d) for d in quote_dates]
+        if days:
+            self.ensure_range(ticker, min(days) - timedelta(days=1), max(days))
+
+    def get_news(self, date_str, ticker='SPY'):
+        """
+        Same contract as news_api_wrapper.get_news: {title: text} for the two-day
+        window ending on `date_str`, newest items first, served from disk.
+        """
+        day = _to_date(date_str)
+        start = day - timedelta(days=1)
+        self.ensure_range(ticker, start, day)
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute(
+                """
+                SELECT title, text FROM news
+                WHERE ticker = ? AND publish_date BETWEEN ? AND ?
+                ORDER BY published_at DESC
+                LIMIT ?
+                """,
+                (ticker, start.isoformat(), day.isoformat(), ITEMS_PER_LOOKUP)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        news = {}
+        for title, text in rows:
+            news[title] = text
+        return news
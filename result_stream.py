@@ -0,0 +1,84 @@
+import io
+import json
+from importlib.util import find_spec
+
+from moment_store import MOMENT_FIELDS
+
+# Columns of the per-day result rows yielded by main.iter_pipeline
+RESULT_COLUMNS = ('quote_date', 'underlying_last', 'daily_return', 'cumulative_return', 'pcr', 'call_volume',
+                  'put_volume', 'news_score', 'combined_score', 'cumulative_sentiment', 'expiries')
+# Fields of each entry of the 'expiries' column: the day's BL moments per expiry and side
+EXPIRY_FIELDS = ('expire_date',) + tuple(f'{side}_{field}' for side in ('call', 'put') for field in MOMENT_FIELDS)
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+ARROW_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
+
+def parse_columns(text=None):
+    """
+    Parses a comma-separated column subset; None or '' selects every column.
+
+    Returns:
+    - columns: tuple of RESULT_COLUMNS in the requested order.
+
+    Raises ValueError on unknown columns.
+    """
+    if not text:
+        return RESULT_COLUMNS
+    columns = tuple(dict.fromkeys(c.strip() for c in text.split(',') if c.strip()))
+    unknown = [c for c in columns if c not in RESULT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns {unknown}; available: {', '.join(RESULT_COLUMNS)}")
+    return columns
+
+
+def ndjson_stream(rows, columns=RESULT_COLUMNS):
+    """
+    Encodes result rows as newline-delimited JSON, one line per row as it arrives.
+    """
+    for row in rows:
+        yield (json.dumps({c: row[c] for c in columns}) + '\n').encode()
+
+
+def arrow_available():
+    return find_spec('pyarrow') is not None
+
+
+def _arrow_schema(pa, columns):
+    types = {c: pa.float64() for c in RESULT_COLUMNS}
+    types['quote_date'] = pa.string()
+    types['expiries'] = pa.list_(pa.struct(
+        [pa.field('expire_date', pa.string())] + [pa.field(name, pa.float64()) for name in EXPIRY_FIELDS[1:]]
+    ))
+    return pa.schema([pa.field(c, types[c]) for c in columns])
+
+
+def arrow_stream(rows, columns=RESULT_COLUMNS, batch_rows=20):
+    """
+    Encodes result rows as an Arrow IPC stream with one record batch per
+    `batch_rows` rows. pyarrow is an optional dependency, imported here.
+    """
+    import pyarrow as pa
+
+    schema = _arrow_schema(pa, columns)
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+
+    def flush():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    yield flush()
+    batch = []
+    for row in rows:
+        batch.append({c: row[c] for c in columns})
+        if len(batch) == batch_rows:
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+            batch = []
+            yield flush()
+    if batch:
+        writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+    writer.close()
+    yield flush()
@@ -0,0 +1,80 @@
+import sqlite3
+
+import pandas as pd
+
+# Sidecar database next to /app/spx_data.db holding the scored daily series
+DEFAULT_SENTIMENT_DB = '/app/sentiment.db'
+
+SERIES_COLUMNS = ('quote_date', 'underlying_last', 'daily_return', 'cumulative_return', 'news_score',
+                  'daily_sentiment', 'cumulative_sentiment', 'pcr', 'call_volume', 'put_volume')
+
+
+class SentimentStore:
+    """
+    Persistent daily sentiment series, one row per scored quote date.
+
+    Each row carries the running totals (cumulative return and cumulative
+    sentiment) up to that day, so appending a new day only needs the last row.
+    """
+
+    def __init__(self, db_path=DEFAULT_SENTIMENT_DB):
+        self.db_path = db_path
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS daily_sentiment (
+                    quote_date TEXT PRIMARY KEY,
+                    {', '.join(f'{c} REAL' for c in SERIES_COLUMNS[1:])},
+                    scored_at  TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def last_row(self):
+        """
+        Returns the most recent row as a dict, or None if the series is empty.
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute(
+                f"SELECT {', '.join(SERIES_COLUMNS)} FROM daily_sentiment ORDER BY quote_date DESC LIMIT 1"
+            ).fetchone()
+        finally:
+            conn.close()
+        return None if row is None else dict(zip(SERIES_COLUMNS, row))
+
+    def append(self, rows):
+        """
+        Writes rows (dicts with the SERIES_COLUMNS keys); a re-scored date replaces its old row.
+        """
+        if not rows:
+            return
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO daily_sentiment ({', '.join(SERIES_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(SERIES_COLUMNS))})",
+                [(str(row['quote_date']),) + tuple(None if row[c] is None else float(row[c])
+                                                   for c in SERIES_COLUMNS[1:])
+                 for row in rows]
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def load(self, n_days=None):
+        """
+        Returns the stored series as a DataFrame in date order (the last `n_days` rows if given).
+        """
+        query = f"SELECT {', '.join(SERIES_COLUMNS)} FROM daily_sentiment ORDER BY quote_date"
+        params = []
+        if n_days is not None:
+            query = f"SELECT * FROM ({query} DESC LIMIT ?) ORDER BY quote_date"
+            params = [int(n_days)]
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return pd.read_sql_query(query, conn, params=params)
+        finally:
+            conn.close()
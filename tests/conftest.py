@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import sample_days, write_options_db  # noqa: E402
+
+
+@pytest.fixture
+def padded_db(tmp_path):
+    """OptionsDX-style database whose dates carry the export's leading space."""
+    return write_options_db(str(tmp_path / 'options.db'), sample_days())
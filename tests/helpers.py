@@ -0,0 +1,65 @@
+"""Synthetic option data shared by the tests."""
+import sqlite3
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+from data_loader import OPTION_COLUMNS
+
+
+def bs_call(strikes, spot=4000.0, t=10 / 252, vol=0.2, r=0.01):
+    d1 = (np.log(spot / strikes) + (r + vol ** 2 / 2) * t) / (vol * np.sqrt(t))
+    d2 = d1 - vol * np.sqrt(t)
+    return spot * norm.cdf(d1) - strikes * np.exp(-r * t) * norm.cdf(d2)
+
+
+def option_chain(expiries, spot=4000.0):
+    """
+    One quote date's chain sorted by (expire_date, strike), for (expire_date, dte) pairs.
+    """
+    rows = []
+    for expire_date, dte in expiries:
+        strikes = np.arange(spot - 200.0, spot + 200.0, 10.0)
+        calls = bs_call(strikes, spot=spot, t=dte / 252)
+        puts = calls - spot + strikes * np.exp(-0.01 * dte / 252)
+        rows.append(pd.DataFrame({'expire_date': expire_date, 'dte': float(dte), 'strike': strikes,
+                                  'c_last': calls, 'p_last': puts}))
+    if not rows:
+        return pd.DataFrame({'expire_date': [], 'dte': [], 'strike': [], 'c_last': [], 'p_last': []})
+    return pd.concat(rows, ignore_index=True)
+
+
+def write_options_db(path, days, table='spx_data', pad=' '):
+    """
+    Writes an OptionsDX-style table with every date padded by `pad`, as in the
+    raw OptionsDX export. `days` lists (quote_date, spot, [(expire_date, dte), ...]).
+    """
+    names = list(OPTION_COLUMNS)
+    rows = []
+    for quote_date, spot, expiries in days:
+        chain = option_chain(expiries, spot)
+        for row in chain.itertuples(index=False):
+            rows.append((pad + quote_date, pad + row.expire_date, row.strike, row.c_last, row.p_last, row.dte,
+                         spot, 10.0, 8.0))
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(f"CREATE TABLE {table} ({', '.join(OPTION_COLUMNS[n] for n in names)})")
+        conn.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * len(names))})", rows)
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+
+def sample_days(quote_dates=('2023-01-03', '2023-01-04', '2023-01-05', '2023-01-06', '2023-01-09', '2023-01-10'),
+                expiries=('2023-01-13', '2023-01-20')):
+    """
+    (quote_date, spot, expiries) of a few consecutive days for write_options_db.
+    """
+    days = []
+    for i, quote_date in enumerate(quote_dates):
+        day = pd.Timestamp(quote_date)
+        days.append((quote_date, 4000.0 + 10.0 * i,
+                     [(expiry, (pd.Timestamp(expiry) - day).days) for expiry in expiries]))
+    return days
@@ -0,0 +1,64 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import main
+import news_analysis
+from llm_cache import ResponseCache
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so a client reuses its pooled connections across requests
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if 'response_format' in request:
+            content = json.dumps({'news_analysis_score': 1.0, 'combined_score': 0.5})
+        else:
+            content = f"positive ({len(self.server.requests)})"
+        self.server.requests.append(request)
+        body = json.dumps({
+            'id': 'chatcmpl-test', 'object': 'chat.completion', 'created': 0, 'model': request['model'],
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': content}}],
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_api(monkeypatch, tmp_path):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeOpenAIHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv('OPENAI_BASE_URL', f'http://127.0.0.1:{server.server_port}/v1')
+    monkeypatch.setattr(news_analysis, 'async_client', None)
+    monkeypatch.setattr(news_analysis, 'response_cache', ResponseCache(str(tmp_path / 'llm_cache.db')))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_async_scoring_runs_on_several_event_loops(fake_api):
+    for run in range(3):
+        # Distinct data per run, so no request is served from the response cache
+        def news_lookup(day, ticker, run=run):
+            return {f'{ticker} headline on {day}': f'run {run}'}
+
+        payloads = [{'quote_date': f'2023-01-{10 + day}', 'bl_data': f'run {run}', 'pcr': 1.0,
+                     'call_volume': 1.0, 'put_volume': 1.0} for day in range(2)]
+        scores = asyncio.run(main.score_days_async(payloads, 'SPY', max_concurrency=2,
+                                                   news_lookup=news_lookup))
+        assert scores == [(1.0, 0.5), (1.0, 0.5)]
+    assert len(fake_api.requests) == 3 * 2 * 2
@@ -0,0 +1,13 @@
+from backfill import backfill_moments
+from moment_store import MomentStore, params_version, source_scope
+
+
+def test_date_bounds_match_padded_dates(padded_db, tmp_path):
+    moment_db = str(tmp_path / 'moments.db')
+    computed = backfill_moments(start='2023-01-05', end='2023-01-06', workers=1, db_path=padded_db,
+                                columnar_dir=None, moment_db_path=moment_db)
+
+    assert computed == [' 2023-01-05', ' 2023-01-06']
+    version = params_version(risk_free_rate=0.01, smoothing_factor=0, spline_degree=3,
+                             source=source_scope(padded_db))
+    assert MomentStore(moment_db).stored_dates(version) == set(computed)
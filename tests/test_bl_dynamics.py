@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from BL_dynamics import MomentCache, check_moment_methods, compute_chain_moments, grid_moments
+from helpers import bs_call, option_chain
+from metrics import PipelineMetrics
+
+
+def test_grid_moments_do_not_depend_on_the_batch():
+    narrow = np.arange(3700.0, 4300.0, 5.0)
+    wide = np.arange(3000.0, 5000.0, 25.0)
+    slice_a = (narrow, bs_call(narrow))
+    slice_b = (wide, bs_call(wide, t=40 / 252))
+    growth_a, growth_b = np.exp(0.01 * 10 / 252), np.exp(0.01 * 40 / 252)
+
+    alone = grid_moments([slice_a], [growth_a])
+    batched = grid_moments([slice_b, slice_a], [growth_b, growth_a])
+    for name, values in alone.items():
+        assert batched[name][1] == pytest.approx(values[0], rel=1e-12)
+
+
+# quad itself loses accuracy on the narrow density of a short-dated slice
+@pytest.mark.parametrize('dte, rtol', [(3, 1e-3), (10, 1e-6), (30, 1e-6)])
+def test_exact_moments_match_quad(dte, rtol):
+    strikes = np.arange(3600.0, 4400.0, 10.0)
+    ok, abs_errors = check_moment_methods(bs_call(strikes, t=dte / 252), strikes, dte / 252, rtol=rtol)
+    assert ok, abs_errors
+
+
+def test_cache_hits_are_counted_per_call():
+    chain = option_chain([('2023-01-13', 10), ('2023-01-20', 15)])
+    cache = MomentCache()
+    first, second = PipelineMetrics(), PipelineMetrics()
+
+    def moments(metrics):
+        return compute_chain_moments(chain['strike'], chain['c_last'], chain['p_last'], chain['dte'],
+                                     chain['expire_date'], quote_date='2023-01-03', cache=cache, presorted=True,
+                                     metrics=metrics)
+
+    moments(first)
+    moments(second)
+    moments(None)
+
+    assert dict(first.caches['bl_moments']) == {'hits': 0, 'misses': 4}
+    assert dict(second.caches['bl_moments']) == {'hits': 4, 'misses': 0}
+    assert (cache.hits, cache.misses) == (8, 4)
@@ -0,0 +1,48 @@
+import news_analysis
+from bl_payload import ESTIMATOR_SUFFIX, estimate_tokens, format_bl_table
+
+
+def moments(mean, scale=1.0):
+    return {'mean': mean, 'std_dev': 50.0 * scale, 'skewness': -0.1 * scale, 'kurtosis': 3.0 * scale}
+
+
+def estimators(expiries):
+    return {
+        f'{expiry}{ESTIMATOR_SUFFIX}': {
+            'call_data_t': moments(4000.0 + i), 'call_data_t_minus_1': moments(3990.0 + i, 0.9),
+            'put_data_t': moments(4001.0 + i), 'put_data_t_minus_1': moments(3991.0 + i, 0.9),
+        }
+        for i, expiry in enumerate(expiries)
+    }
+
+
+def test_table_rows_and_deltas():
+    lines = format_bl_table(estimators(['2023-01-20', '2023-01-13'])).splitlines()
+    assert lines[1].split('\t')[:4] == ['expiry', 'side', 'mean', 'd_mean']
+    # Nearest expiry first, one row per side
+    assert [line.split('\t')[:2] for line in lines[2:]] == [
+        ['2023-01-13', 'call'], ['2023-01-13', 'put'], ['2023-01-20', 'call'], ['2023-01-20', 'put']]
+    # 2023-01-13 is the second expiry built: mean 4001 on day t, 3991 on day t-1
+    assert lines[2].split('\t')[2:6] == ['4001', '10', '50', '5']
+
+
+def test_token_budget_drops_the_farthest_expiries():
+    data = estimators([f'2023-02-{day:02d}' for day in range(1, 21)])
+    full = format_bl_table(data, token_budget=None)
+    budget = estimate_tokens(full) // 3
+    table = format_bl_table(data, token_budget=budget)
+
+    rows = [line.split('\t')[0] for line in table.splitlines()[2:-1]]
+    kept = sorted(set(rows))
+    assert kept == [f'2023-02-{day:02d}' for day in range(1, len(kept) + 1)]
+    assert table.splitlines()[-1] == f'({20 - len(kept)} further expiries omitted)'
+    assert estimate_tokens('\n'.join(table.splitlines()[:-1])) <= budget
+
+
+def test_prompt_describes_the_format_it_sends():
+    data = estimators(['2023-01-13'])
+    table_prompt = news_analysis.build_analysis_prompt(format_bl_table(data), 'SPY', 'news', 1.0, 1.0, 1.0)
+    dict_prompt = news_analysis.build_analysis_prompt(data, 'SPY', 'news', 1.0, 1.0, 1.0)
+    assert 'tab-separated table' in table_prompt and 'd_std_dev' in table_prompt
+    assert 'tab-separated' not in dict_prompt and 'd_std_dev' not in dict_prompt
+    assert 'is a dict with one entry per expiration date' in dict_prompt
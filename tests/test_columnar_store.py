@@ -0,0 +1,45 @@
+import sqlite3
+
+import pytest
+
+import columnar_store
+from columnar_store import ColumnarStore, ingest
+from data_loader import OPTION_COLUMNS
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'options.db')
+    conn = sqlite3.connect(path)
+    names = list(OPTION_COLUMNS)
+    conn.execute(f"CREATE TABLE spx_data ({', '.join(OPTION_COLUMNS[n] for n in names)})")
+    rows = [(quote_date, '2023-01-20', strike, 5.0, 4.0, 7.0, 4000.0, 10.0, 8.0)
+            for quote_date in ('2023-01-12', '2023-01-13') for strike in (3900.0, 4000.0, 4100.0)]
+    rows.append((None, '2023-01-20', 4000.0, 5.0, 4.0, 7.0, 4000.0, 10.0, 8.0))
+    conn.executemany(f"INSERT INTO spx_data VALUES ({', '.join('?' * len(names))})", rows)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_columns_hold_exactly_the_ingested_rows(db_path, tmp_path):
+    out_dir = str(tmp_path / 'columns')
+    meta = ingest(db_path, out_dir)
+
+    store = ColumnarStore(out_dir)
+    assert meta['n_rows'] == 6
+    assert all(len(column) == 6 for column in store.columns.values())
+    assert store.day_offsets[-1] == 6
+
+
+def test_row_count_change_leaves_no_manifest(db_path, tmp_path, monkeypatch):
+    out_dir = str(tmp_path / 'columns')
+    ingest(db_path, out_dir)
+
+    # A day read back shorter than counted, as if rows were deleted mid-ingestion
+    read_days = columnar_store.iter_option_days
+    monkeypatch.setattr(columnar_store, 'iter_option_days',
+                        lambda *args, **kwargs: ((d, df.iloc[1:]) for d, df in read_days(*args, **kwargs)))
+    with pytest.raises(ValueError):
+        ingest(db_path, out_dir)
+    assert not ColumnarStore.exists(out_dir)
@@ -0,0 +1,21 @@
+import sqlite3
+
+from columnar_store import ColumnarStore, ingest
+from data_loader import quote_dates_since, quote_dates_until
+
+
+def test_quote_date_ranges_ignore_padding(padded_db, tmp_path):
+    conn = sqlite3.connect(padded_db)
+    try:
+        assert quote_dates_until(conn, '2023-01-04') == [' 2023-01-03', ' 2023-01-04']
+        assert quote_dates_since(conn, '2023-01-09') == [' 2023-01-09', ' 2023-01-10']
+        # A stored (padded) date works as a bound too
+        assert quote_dates_since(conn, ' 2023-01-09') == [' 2023-01-09', ' 2023-01-10']
+    finally:
+        conn.close()
+
+    out_dir = str(tmp_path / 'columns')
+    ingest(padded_db, out_dir)
+    store = ColumnarStore(out_dir)
+    assert store.quote_dates_until('2023-01-04') == [' 2023-01-03', ' 2023-01-04']
+    assert store.quote_dates_since('2023-01-09') == [' 2023-01-09', ' 2023-01-10']
@@ -0,0 +1,14 @@
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_does_not_load_the_pipeline():
+    # A fresh interpreter, since other tests have already imported pandas
+    code = ("import sys, fastapi_app; "
+            "print(sorted(m for m in ('pandas', 'numpy', 'main', 'matplotlib') if m in sys.modules))")
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                         cwd=REPO_ROOT)
+    assert out.stdout.strip() == '[]'
@@ -0,0 +1,33 @@
+import itertools
+import sqlite3
+
+import llm_cache
+from llm_cache import ResponseCache
+
+
+def stored_keys(cache):
+    conn = sqlite3.connect(cache.db_path)
+    try:
+        return {row[0] for row in conn.execute("SELECT key FROM llm_responses")}
+    finally:
+        conn.close()
+
+
+def test_evicts_least_recently_used_in_one_batch(tmp_path, monkeypatch):
+    clock = itertools.count()
+    monkeypatch.setattr(llm_cache.time, 'time', lambda: float(next(clock)))
+    cache = ResponseCache(str(tmp_path / 'cache.db'), max_entries=10)
+
+    for i in range(10):
+        cache.put(f'k{i}', i)
+    assert cache.get('k0') == 0  # k0 becomes the most recently used
+    assert len(stored_keys(cache)) == 10
+
+    cache.put('k10', 10)
+    # Over capacity: trimmed to 90% of max_entries, oldest last_used first
+    keys = stored_keys(cache)
+    assert len(keys) == 9
+    assert keys == {'k0', 'k3', 'k4', 'k5', 'k6', 'k7', 'k8', 'k9', 'k10'}
+
+    cache.put('k11', 11)
+    assert len(stored_keys(cache)) == 10
@@ -0,0 +1,28 @@
+import os
+
+from data_loader import DEFAULT_DB_PATH, DEFAULT_TABLE
+from moment_store import params_version, source_scope
+
+
+def test_default_source_keeps_the_existing_version():
+    assert source_scope() is None
+    assert source_scope(DEFAULT_DB_PATH, DEFAULT_TABLE) is None
+    assert params_version(source=source_scope()) == params_version()
+
+
+def test_source_scope_follows_the_data_source(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db_path = str(tmp_path / 'qqq.db')
+    assert source_scope('qqq.db', 'options') == source_scope(db_path, 'options')
+    assert source_scope(db_path, 'options') != source_scope(db_path, 'options_qqq')
+    assert source_scope(DEFAULT_DB_PATH, 'options_qqq') != source_scope()
+    assert params_version(source=source_scope(db_path)).endswith(f'|src={os.path.abspath(db_path)}:{DEFAULT_TABLE}')
+
+
+def test_moment_method_versions_spline_rows():
+    default = params_version(risk_free_rate=0.01, smoothing_factor=0, spline_degree=3)
+    assert default == 'r=0.01|s=0|k=3|dpy=252'
+    assert params_version(moment_method='exact') == default
+    assert params_version(moment_method='quad') == default + '|m=quad'
+    # The grid engine does not use moment_method
+    assert params_version(engine='grid', moment_method='quad') == params_version(engine='grid')
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import pytest
+
+import news_analysis
+from llm_cache import ResponseCache
+
+
+class FakeCompletions:
+    def __init__(self, parsed):
+        self.parsed = parsed
+        self.calls = []
+
+    def parse(self, **kwargs):
+        self.calls.append(kwargs)
+        message = SimpleNamespace(parsed=self.parsed)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture
+def fake_client(monkeypatch, tmp_path):
+    def install(parsed):
+        completions = FakeCompletions(parsed)
+        client = SimpleNamespace(beta=SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+        monkeypatch.setattr(news_analysis, 'client', client)
+        monkeypatch.setattr(news_analysis, 'response_cache', ResponseCache(str(tmp_path / 'llm_cache.db')))
+        return completions
+    return install
+
+
+def test_batch_matches_padded_quote_dates(fake_client, monkeypatch):
+    parsed = news_analysis.BatchNewsResponse(days=[
+        news_analysis.DayNewsClassification(quote_date='2023-01-11', classification='positive'),
+        news_analysis.DayNewsClassification(quote_date='2023-01-12 ', classification='negative'),
+    ])
+    completions = fake_client(parsed)
+    monkeypatch.setattr(news_analysis, 'get_score_from_news', lambda text, ticker: pytest.fail('single-day fallback'))
+
+    news_by_date = {' 2023-01-11 ': {'a': 'x'}, '2023-01-12\n': {'b': 'y'}}
+    results = news_analysis.get_score_from_news_batch(news_by_date, 'SPY')
+
+    assert results == {' 2023-01-11 ': 'positive', '2023-01-12\n': 'negative'}
+    assert len(completions.calls) == 1
+    assert 'Date 2023-01-11:' in completions.calls[0]['messages'][1]['content']
+
+    # A cache hit maps back to the caller's keys too
+    assert news_analysis.get_score_from_news_batch(news_by_date, 'SPY') == results
+    assert len(completions.calls) == 1
@@ -0,0 +1,70 @@
+import json
+from datetime import date, timedelta
+
+from news_store import NewsStore, file_fetcher
+
+
+def news_item(title, published):
+    return {'title': title, 'text': f'{title} text', 'date': published}
+
+
+ITEMS = [
+    news_item('Monday open', 'Mon, 02 Jan 2023 09:30:00 -0500'),
+    news_item('Tuesday open', 'Tue, 03 Jan 2023 09:30:00 -0500'),
+    news_item('Tuesday close', 'Tue, 03 Jan 2023 16:00:00 -0500'),
+    news_item('Wednesday open', 'Wed, 04 Jan 2023 09:30:00 -0500'),
+    news_item('Wednesday close', 'Wed, 04 Jan 2023 16:00:00 -0500'),
+]
+
+
+def counting_store(tmp_path, items, page_size=None):
+    path = tmp_path / 'news.json'
+    path.write_text(json.dumps({'data': items}))
+    fetch = file_fetcher(str(path), page_size)
+    calls = []
+
+    def fetcher(ticker, start_date, end_date, page=1):
+        calls.append((start_date, end_date, page))
+        return fetch(ticker, start_date, end_date, page)
+
+    return NewsStore(str(tmp_path / 'news.db'), fetcher), calls
+
+
+def test_pagination_collects_every_page(tmp_path):
+    store, calls = counting_store(tmp_path, ITEMS, page_size=2)
+
+    news = store.get_news('2023-01-04')
+
+    assert [page for _, _, page in calls] == [1, 2]
+    assert list(news) == ['Wednesday close', 'Wednesday open', 'Tuesday close', 'Tuesday open']
+
+
+def test_covered_days_are_not_fetched_again(tmp_path):
+    store, calls = counting_store(tmp_path, ITEMS)
+
+    store.prefetch('SPY', ['2023-01-03', '2023-01-04'])
+    store.get_news('2023-01-03')
+    store.get_news('2023-01-05')
+
+    assert calls == [(date(2023, 1, 2), date(2023, 1, 4), 1), (date(2023, 1, 5), date(2023, 1, 5), 1)]
+
+
+def test_unparseable_dates_are_skipped_and_the_range_covered(tmp_path):
+    store, calls = counting_store(tmp_path, ITEMS[:2] + [news_item('Garbled', 'yesterday')] + ITEMS[2:])
+
+    news = store.get_news('2023-01-03')
+    store.get_news('2023-01-03')
+
+    assert list(news) == ['Tuesday close', 'Tuesday open', 'Monday open']
+    assert len(calls) == 1
+
+
+def test_days_from_today_on_stay_uncovered(tmp_path):
+    store, calls = counting_store(tmp_path, ITEMS)
+    today = date.today()
+    yesterday = today - timedelta(days=1)
+
+    store.get_news(today.isoformat())
+    store.get_news(today.isoformat())
+
+    assert [(start, end) for start, end, _ in calls] == [(yesterday, today), (today, today)]
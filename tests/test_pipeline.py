@@ -0,0 +1,91 @@
+import pandas as pd
+
+from helpers import option_chain, sample_days, write_options_db
+import main
+from main import build_payloads
+from moment_store import MomentStore, params_version
+
+
+def test_days_without_quotes_in_the_dte_window_are_still_scored(tmp_path):
+    days = [
+        ('2023-01-10', option_chain([('2023-01-17', 5), ('2023-01-20', 10)])),
+        ('2023-01-11', option_chain([])),
+        ('2023-01-12', option_chain([('2023-01-17', 3), ('2023-01-20', 8)])),
+        ('2023-01-13', option_chain([('2023-01-17', 2), ('2023-01-20', 7)])),
+    ]
+    df_summary = pd.DataFrame({'c_volume': [100.0] * 4, 'p_volume': [80.0] * 4},
+                              index=[quote_date for quote_date, _ in days])
+    store = MomentStore(str(tmp_path / 'moments.db'))
+
+    payloads = build_payloads(iter(days), df_summary, {}, store, params_version())
+
+    assert [payload['quote_date'] for payload in payloads] == ['2023-01-11', '2023-01-12', '2023-01-13']
+    assert payloads[0]['bl_estimators'] == {} and payloads[1]['bl_estimators'] == {}
+    assert sorted(payloads[2]['bl_estimators']) == ['2023-01-17_bl_estimators', '2023-01-20_bl_estimators']
+    assert all(payload['pcr'] == 0.8 for payload in payloads)
+
+
+def fake_scores(payloads, on_done, *args, **kwargs):
+    for payload in payloads:
+        on_done(payload, (1.0, 0.5))
+
+
+def test_iter_pipeline_ranges_on_padded_dates(padded_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, 'score_payloads', fake_scores)
+
+    def dates(**kwargs):
+        rows = main.iter_pipeline(db_path=padded_db, columnar_dir=None, news_db_path=None,
+                                  moment_db_path=str(tmp_path / 'moments.db'), **kwargs)
+        return [row['quote_date'].strip() for row in rows]
+
+    assert dates(start='2023-01-04', end='2023-01-05') == ['2023-01-04', '2023-01-05']
+    assert dates(end='2023-01-04') == ['2023-01-04']
+    assert dates(n_days=2) == ['2023-01-09', '2023-01-10']
+
+
+def test_incremental_updates_match_a_full_recompute(tmp_path, monkeypatch):
+    def scores_by_day(payloads, on_done, *args, **kwargs):
+        for payload in payloads:
+            on_done(payload, (1.0, float(payload['quote_date'].strip()[-2:])))
+
+    monkeypatch.setattr(main, 'score_payloads', scores_by_day)
+    days = sample_days()
+
+    def update(db_path, sentiment_db, initial_days=3):
+        return main.update_pipeline(sentiment_db_path=str(tmp_path / sentiment_db), initial_days=initial_days,
+                                    moment_db_path=str(tmp_path / 'moments.db'), db_path=db_path,
+                                    columnar_dir=None, news_db_path=None)
+
+    first = update(write_options_db(str(tmp_path / 'first.db'), days[:4]), 'incremental.db')
+    full_db = write_options_db(str(tmp_path / 'full.db'), days)
+    incremental = update(full_db, 'incremental.db')
+    full = update(full_db, 'full.db', initial_days=len(days) - 1)
+
+    assert len(first) == 3 and [d.strip() for d in incremental.attrs['new_dates']] == ['2023-01-09', '2023-01-10']
+    columns = ['underlying_last', 'daily_return', 'cumulative_return', 'daily_sentiment', 'cumulative_sentiment']
+    pd.testing.assert_frame_equal(incremental[columns].reset_index(drop=True), full[columns].reset_index(drop=True))
+
+
+def test_universe_progress_reaches_100_with_short_tickers(tmp_path, monkeypatch):
+    async def no_news(quote_date, ticker, http):
+        return {}
+
+    async def news_score(news, ticker, **kwargs):
+        return 'neutral'
+
+    async def analysis(bl_data, ticker, news_analysis, pcr_data, call_volume, put_volume, **kwargs):
+        return 0.0, 0.5
+
+    monkeypatch.setattr(main, 'get_news_async', no_news)
+    monkeypatch.setattr(main, 'get_score_from_news_async', news_score)
+    monkeypatch.setattr(main, 'analyze_news_async', analysis)
+    days = sample_days()
+    long_db = write_options_db(str(tmp_path / 'long.db'), days)
+    short_db = write_options_db(str(tmp_path / 'short.db'), days[:3])
+    progress = []
+
+    main.run_universe([('SPY', long_db, 'spx_data'), ('QQQ', short_db, 'spx_data')], n_days=5,
+                      progress_callback=progress.append, moment_db_path=str(tmp_path / 'moments.db'),
+                      news_db_path=None)
+
+    assert len(progress) == 7 and progress[-1] == 100